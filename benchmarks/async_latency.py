@@ -0,0 +1,52 @@
+'''
+Event loop stalls while a whole-tree operation runs, with and without AsyncRBTree.
+
+A probe task wakes up every millisecond; the longest delay past its due
+time is the worst latency an unrelated request would see.
+
+Run from the repository root::
+
+    python -m benchmarks.async_latency
+'''
+import asyncio
+import time
+
+from rbtree import AsyncRBTree, RBTree
+
+
+async def worst_stall(operation) -> tuple:
+    worst = 0.0
+    running = True
+
+    async def probe():
+        nonlocal worst
+        while running:
+            due = time.perf_counter() + 0.001
+            await asyncio.sleep(0.001)
+            worst = max(worst, time.perf_counter() - due)
+
+    task = asyncio.create_task(probe())
+    await asyncio.sleep(0.01)
+    start = time.perf_counter()
+    await operation()
+    elapsed = time.perf_counter() - start
+    running = False
+    await task
+    return worst, elapsed
+
+
+async def main():
+    for n in (10 ** 5, 10 ** 6):
+        tree = RBTree.from_sorted((i, i) for i in range(n))
+        facade = AsyncRBTree(tree)
+
+        async def blocking():
+            tree.get_keys()
+
+        for name, operation in (('RBTree', blocking), ('AsyncRBTree', facade.keys)):
+            worst, elapsed = await worst_stall(operation)
+            print(f'{name:>11} keys() of {n:>7}: {elapsed * 1e3:7.1f} ms total, {worst * 1e3:7.2f} ms worst stall')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+'''
+Expiry of a TTL cache by scanning an RBTree versus RBTreeCache.
+
+The cache holds ``n`` entries in a steady state: every round sets a small
+batch of new entries and drops the batch that expired.
+
+Run from the repository root::
+
+    python -m benchmarks.cache
+'''
+import time
+
+from rbtree import RBTree, RBTreeCache
+
+
+BATCH = 10
+ROUNDS = 200
+
+
+def scan(n: int) -> float:
+    '''Keep ``(value, expires)`` pairs and scan the items for expired ones.'''
+    ttl = n // BATCH
+    t = RBTree.from_items(((i, (i, i // BATCH + ttl)) for i in range(n)), presorted=True)
+    start = time.perf_counter()
+    for now in range(ttl, ttl + ROUNDS):
+        for i in range(now * BATCH, (now + 1) * BATCH):
+            t[i] = (i, now + ttl)
+        expired = [k for k, (_, expires) in t.items() if expires <= now]
+        for k in expired:
+            del t[k]
+    return time.perf_counter() - start
+
+
+def cache(n: int) -> float:
+    ttl = n // BATCH
+    clock = [0]
+    c = RBTreeCache(ttl=ttl, timer=lambda: clock[0])
+    for i in range(n):
+        clock[0] = i // BATCH
+        c[i] = i
+    start = time.perf_counter()
+    for now in range(ttl, ttl + ROUNDS):
+        clock[0] = now
+        for i in range(now * BATCH, (now + 1) * BATCH):
+            c[i] = i
+        c.expire()
+    return time.perf_counter() - start
+
+
+def main():
+    for n in (10 ** 3, 10 ** 4, 10 ** 5):
+        for name, run in (('scan', scan), ('cache', cache)):
+            seconds = run(n)
+            print(f'{name:>5} {n:>7} entries: {seconds / ROUNDS * 1e3:7.3f} ms/round')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+'''
+Multithreaded throughput of ConcurrentRBTree and of an RBTree behind one mutex.
+
+Every thread runs a mix of point lookups and inserts; one thread in four
+also iterates over the first keys now and then.
+
+Run from the repository root::
+
+    python -m benchmarks.concurrency [threads]
+'''
+import random
+import sys
+import threading
+import time
+from itertools import islice
+
+from rbtree import ConcurrentRBTree, RBTree
+
+
+class LockedRBTree:
+    '''An RBTree with every call behind one global mutex.'''
+
+    def __init__(self, *args) -> None:
+        self._tree = RBTree(*args)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._tree.get(key, default)
+
+    def __setitem__(self, key, value) -> None:
+        with self._lock:
+            self._tree[key] = value
+
+    def items(self):
+        with self._lock:
+            return list(self._tree.items())
+
+
+def worker(tree, ops: int, read_ratio: float, scan: bool, seed: int, n: int) -> None:
+    rng = random.Random(seed)
+    for i in range(ops):
+        k = rng.randrange(2 * n)
+        if rng.random() < read_ratio:
+            tree.get(k)
+        else:
+            tree[k] = i
+        if scan and i % 1000 == 0:
+            for _ in islice(tree.items(), 100):
+                pass
+
+
+def throughput(cls, threads: int, read_ratio: float, n: int = 10 ** 5, ops: int = 20000) -> float:
+    tree = cls((i, i) for i in range(0, 2 * n, 2))
+    workers = [
+        threading.Thread(target=worker, args=(tree, ops, read_ratio, i % 4 == 0, i, n))
+        for i in range(threads)
+    ]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return threads * ops / (time.perf_counter() - start)
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    for read_ratio in (0.99, 0.9, 0.5):
+        for cls in (LockedRBTree, ConcurrentRBTree):
+            ops = throughput(cls, threads, read_ratio)
+            print(f'{cls.__name__:>16} {threads} threads, {read_ratio:.0%} reads: {ops / 1e3:7.1f} kops/s')
+
+
+if __name__ == '__main__':
+    main()
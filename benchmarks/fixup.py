@@ -0,0 +1,41 @@
+'''
+Insert and delete latency of RBTree, dominated by the rebalancing fix-up.
+
+Run from the repository root::
+
+    python -m benchmarks.fixup [n]
+'''
+import random
+import sys
+import time
+
+from rbtree import RBTree
+
+
+def measure(n: int, seed: int = 0):
+    '''Return the mean insert and delete latency in seconds for ``n`` random keys.'''
+    keys = list(range(n))
+    random.Random(seed).shuffle(keys)
+    t = RBTree()
+
+    start = time.perf_counter()
+    for k in keys:
+        t[k] = k
+    insert = (time.perf_counter() - start) / n
+
+    random.Random(seed + 1).shuffle(keys)
+    start = time.perf_counter()
+    for k in keys:
+        del t[k]
+    delete = (time.perf_counter() - start) / n
+    return insert, delete
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 6
+    insert, delete = measure(n)
+    print(f'{n} keys: insert {insert * 1e6:.2f} us, delete {delete * 1e6:.2f} us')
+
+
+if __name__ == '__main__':
+    main()
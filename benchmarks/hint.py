@@ -0,0 +1,50 @@
+'''
+Insertion latency of nearly sorted keys with and without a cursor.
+
+The keys are timestamps with a small jitter, as in an ingestion stream.
+
+Run from the repository root::
+
+    python -m benchmarks.hint
+'''
+import random
+import timeit
+
+from rbtree import RBTree
+
+
+def stream(n: int, jitter: int):
+    rng = random.Random(n)
+    return [i * 10 + rng.randrange(-jitter, jitter + 1) for i in range(n)]
+
+
+def plain(keys) -> None:
+    t = RBTree()
+    for k in keys:
+        t[k] = k
+
+
+def with_cursor(keys) -> None:
+    t = RBTree()
+    c = t.cursor()
+    for k in keys:
+        c.insert(k, k)
+
+
+def with_hint(keys) -> None:
+    t = RBTree()
+    node = None
+    for k in keys:
+        node = t.insert(k, k, hint=node)
+
+
+def main():
+    for n in (10 ** 4, 10 ** 5, 10 ** 6):
+        keys = stream(n, 50)
+        for name, insert in (('plain', plain), ('cursor', with_cursor), ('hint', with_hint)):
+            seconds = min(timeit.repeat(lambda: insert(keys), number=1, repeat=3))
+            print(f'{name:>6} {n:>8} keys: {seconds / n * 1e6:5.2f} us/insert')
+
+
+if __name__ == '__main__':
+    main()
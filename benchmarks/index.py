@@ -0,0 +1,60 @@
+'''
+Memory and point-lookup latency of RBTree with and without the hash index.
+
+Run from the repository root::
+
+    python -m benchmarks.index
+'''
+import gc
+import random
+import timeit
+import tracemalloc
+
+from rbtree import RBTree
+
+
+def build(keys, indexed: bool) -> RBTree:
+    t = RBTree()
+    if indexed:
+        t.enable_index()
+    for k in keys:
+        t[k] = k
+    return t
+
+
+def bytes_per_entry(keys, indexed: bool) -> float:
+    gc.collect()
+    tracemalloc.start()
+    t = build(keys, indexed)
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del t
+    return used / len(keys)
+
+
+def seconds_per_lookup(keys, indexed: bool) -> float:
+    t = build(keys, indexed)
+    queries = random.Random(1).choices(keys, k=10 ** 5)
+
+    def run():
+        find = t.find
+        for k in queries:
+            find(k)
+    return min(timeit.repeat(run, number=1, repeat=3)) / len(queries)
+
+
+def main():
+    for n in (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6):
+        keys = [str(i) for i in range(n)]
+        random.Random(n).shuffle(keys)
+        for indexed in (False, True):
+            name = 'index' if indexed else 'tree'
+            print(
+                f'{name:>5} {n:>8} keys: '
+                f'{bytes_per_entry(keys, indexed):7.1f} bytes/entry, '
+                f'{seconds_per_lookup(keys, indexed) * 1e6:5.2f} us/lookup'
+            )
+
+
+if __name__ == '__main__':
+    main()
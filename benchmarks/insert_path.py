@@ -0,0 +1,111 @@
+'''
+Comparisons and time per insert of RBTree.__setitem__.
+
+``legacy_setitem`` replays the former insert path, which descended the tree
+twice (once to look for the key, once to find the leaf to attach to) and
+compared keys through the RBTreeNode operators.
+
+Run from the repository root::
+
+    python -m benchmarks.insert_path
+'''
+import random
+import timeit
+
+from rbtree import RBTree, RBTreeNode, RBTreeColor
+from rbtree._rbtree_node import NIL
+
+
+class CountedKey:
+    '''A sort key which counts how many times it has been compared.'''
+
+    __slots__ = ('key',)
+    comparisons = 0
+
+    def __init__(self, key):
+        self.key = key
+
+    def __lt__(self, other):
+        CountedKey.comparisons += 1
+        return self.key < other.key
+
+    def __gt__(self, other):
+        CountedKey.comparisons += 1
+        return self.key > other.key
+
+
+class CountingRBTree(RBTree):
+    def _get_sort_key(self, key):
+        return CountedKey(super()._get_sort_key(key))
+
+
+def legacy_setitem(tree: RBTree, key, value) -> None:
+    sort_key = tree._get_sort_key(key)
+
+    current = tree._root
+    while current:
+        if sort_key > current.sort_key:
+            current = current.right
+        elif sort_key < current.sort_key:
+            current = current.left
+        else:
+            current.value = value
+            return
+
+    leaf = None
+    current = tree._root
+    while current:
+        leaf = current
+        if sort_key > current.sort_key:
+            current = current.right
+        elif sort_key < current.sort_key:
+            current = current.left
+
+    new_node = RBTreeNode(key, value, RBTreeColor.RED, leaf, NIL, NIL, sort_key)
+    if not leaf:
+        tree._root = new_node
+    elif sort_key > leaf.sort_key:
+        leaf.right = new_node
+    else:
+        leaf.left = new_node
+    tree._fix_insert(new_node)
+    tree._len += 1
+
+
+def comparisons_per_insert(keys, legacy: bool) -> float:
+    t = CountingRBTree()
+    CountedKey.comparisons = 0
+    for k in keys:
+        if legacy:
+            legacy_setitem(t, k, k)
+        else:
+            t[k] = k
+    return CountedKey.comparisons / len(keys)
+
+
+def seconds_per_insert(keys, legacy: bool) -> float:
+    def run():
+        t = RBTree()
+        for k in keys:
+            if legacy:
+                legacy_setitem(t, k, k)
+            else:
+                t[k] = k
+    return min(timeit.repeat(run, number=1, repeat=3)) / len(keys)
+
+
+def main():
+    for n in (10 ** 3, 10 ** 4, 10 ** 5):
+        keys = [str(i) for i in range(n)]
+        random.Random(n).shuffle(keys)
+        for legacy in (True, False):
+            name = 'legacy' if legacy else 'single'
+            print(
+                f'{name:>6} {n:>7} keys: '
+                f'{comparisons_per_insert(keys, legacy):6.2f} comparisons/insert, '
+                f'{seconds_per_insert(keys, legacy) * 1e6:6.2f} us/insert'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+'''
+Per-entry memory footprint of RBTree.
+
+Run from the repository root::
+
+    python -m benchmarks.memory
+'''
+import gc
+import sys
+import tracemalloc
+
+from rbtree import RBTreeNode, create_tree
+
+
+def measure(n: int, engine: str = 'node') -> float:
+    '''Return the number of bytes the tree holds per entry after ``n`` inserts.'''
+    keys = list(range(n))
+    gc.collect()
+    tracemalloc.start()
+    t = create_tree(engine)
+    for k in keys:
+        t[k] = None
+    used, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return used / n
+
+
+def main():
+    print(f'sizeof(RBTreeNode): {sys.getsizeof(RBTreeNode(0, left=None, right=None))} bytes')
+    for engine in ('node', 'array'):
+        for n in (10 ** 3, 10 ** 4, 10 ** 5):
+            print(f'{engine:>6} {n:>8} entries: {measure(n, engine):8.1f} bytes/entry')
+
+
+if __name__ == '__main__':
+    main()
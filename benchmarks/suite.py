@@ -0,0 +1,275 @@
+'''
+Throughput, peak memory and rotation counts of the tree operations.
+
+Every operation runs on every combination of size, key distribution and
+engine. The results are written as JSON, and given the JSON of an earlier
+run as a baseline, the cases that got slower, bigger or rotate more than the
+tolerance allows are reported as regressions (and the exit status is 1).
+
+Run from the repository root::
+
+    python -m benchmarks.suite --output results.json
+    python -m benchmarks.suite --sizes 1000 10000 --baseline results.json
+
+The JSON holds ``meta`` (the Python version and the platform), ``results``
+with one row per operation::
+
+    {"engine": "node", "distribution": "random", "size": 1000,
+     "operation": "insert", "ops": 1000, "seconds": 0.004, "ops_per_sec": 250000.0}
+
+and ``cases`` with one row per tree::
+
+    {"engine": "node", "distribution": "random", "size": 1000,
+     "peak_bytes": 81000, "insert_rotations": 580, "remove_rotations": 350}
+'''
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from rbtree import create_tree
+
+
+DISTRIBUTIONS = ('sequential', 'random', 'near_sorted', 'strings')
+ENGINES = ('node', 'array')
+OPERATIONS = ('insert', 'find', 'get_keys', 'get_values', 'iterate', 'height', 'remove', 'clear')
+DEFAULT_SIZES = (10 ** 3, 10 ** 4, 10 ** 5)
+MAX_QUERIES = 10 ** 5
+
+
+def make_keys(distribution: str, n: int, seed: int = 0) -> List[Any]:
+    '''
+    Get ``n`` distinct keys in insertion order.
+
+    :param distribution: ``'sequential'`` for ascending ints, ``'random'``
+        for shuffled ints, ``'near_sorted'`` for ascending ints with each
+        moved by at most a few places, and ``'strings'`` for shuffled strings.
+    '''
+    rng = random.Random(seed)
+    keys = list(range(n))
+    if distribution == 'random':
+        rng.shuffle(keys)
+    elif distribution == 'near_sorted':
+        for i in range(n - 1):
+            j = min(n - 1, i + rng.randrange(8))
+            keys[i], keys[j] = keys[j], keys[i]
+    elif distribution == 'strings':
+        keys = [f'key{k}' for k in keys]
+        rng.shuffle(keys)
+    elif distribution != 'sequential':
+        raise ValueError(f'Unknown distribution {distribution!r}, expected one of {DISTRIBUTIONS}')
+    return keys
+
+
+def supports(engine: str, distribution: str) -> bool:
+    '''The array engine only takes numeric keys.'''
+    return engine != 'array' or distribution != 'strings'
+
+
+def timed(func: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def fill(tree, keys: List[Any]) -> None:
+    insert = tree.insert
+    for k in keys:
+        insert(k, k)
+
+
+def peak_bytes(engine: str, keys: List[Any]) -> int:
+    '''Get the peak memory traced while inserting the keys into a new tree.'''
+    gc.collect()
+    tracemalloc.start()
+    tree = create_tree(engine)
+    fill(tree, keys)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tree
+    return peak
+
+
+def run_case(engine: str, distribution: str, n: int, memory: bool = True) -> Tuple[List[Dict], Dict]:
+    '''
+    Time every operation on one tree.
+
+    :return: The rows of ``results`` and the row of ``cases`` for the tree.
+    '''
+    keys = make_keys(distribution, n)
+    queries = keys[:]
+    random.Random(1).shuffle(queries)
+    queries = queries[:MAX_QUERIES]
+    rows = []
+
+    def record(operation: str, ops: int, seconds: float) -> None:
+        rows.append({
+            'engine': engine,
+            'distribution': distribution,
+            'size': n,
+            'operation': operation,
+            'ops': ops,
+            'seconds': seconds,
+            # None when the timer is too coarse to measure the operation.
+            'ops_per_sec': ops / seconds if seconds else None,
+        })
+
+    def find_all() -> None:
+        find = tree.find
+        for k in queries:
+            find(k)
+
+    def iterate() -> None:
+        for _ in tree:
+            pass
+
+    def remove_all() -> None:
+        remove = tree.remove
+        for k in queries_all:
+            remove(k)
+
+    tree = create_tree(engine)
+    record('insert', n, timed(lambda: fill(tree, keys)))
+    insert_rotations = tree.rotations
+    record('find', len(queries), timed(find_all))
+    record('get_keys', n, timed(tree.get_keys))
+    record('get_values', n, timed(tree.get_values))
+    record('iterate', n, timed(iterate))
+    record('height', 1, timed(lambda: tree.height))
+
+    queries_all = keys[:]
+    random.Random(2).shuffle(queries_all)
+    record('remove', n, timed(remove_all))
+    remove_rotations = tree.rotations - insert_rotations
+
+    tree = create_tree(engine)
+    fill(tree, keys)
+    record('clear', 1, timed(tree.clear))
+    del tree
+
+    case = {
+        'engine': engine,
+        'distribution': distribution,
+        'size': n,
+        'peak_bytes': peak_bytes(engine, keys) if memory else None,
+        'insert_rotations': insert_rotations,
+        'remove_rotations': remove_rotations,
+    }
+    return rows, case
+
+
+def run(
+    sizes: Tuple[int, ...] = DEFAULT_SIZES,
+    distributions: Tuple[str, ...] = DISTRIBUTIONS,
+    engines: Tuple[str, ...] = ENGINES,
+    memory: bool = True,
+    repeat: int = 3,
+    log: Optional[Callable[[str], None]] = None,
+) -> Dict[str, Any]:
+    '''
+    Run every case and get the JSON document of the results.
+
+    :param repeat: The number of runs of each case; the fastest time of each
+        operation is kept.
+    '''
+    results, cases = [], []
+    for n in sizes:
+        for distribution in distributions:
+            for engine in engines:
+                if not supports(engine, distribution):
+                    continue
+                rows, case = run_case(engine, distribution, n, memory)
+                for _ in range(repeat - 1):
+                    again, _ = run_case(engine, distribution, n, memory=False)
+                    for row, other in zip(rows, again):
+                        if other['seconds'] < row['seconds']:
+                            row.update(seconds=other['seconds'], ops_per_sec=other['ops_per_sec'])
+                results.extend(rows)
+                cases.append(case)
+                if log is not None:
+                    rates = ', '.join(
+                        f'{row["operation"]} {row["ops_per_sec"]:.3g}/s' for row in rows if row['ops_per_sec'] is not None
+                    )
+                    log(f'{engine:>5} {distribution:>11} {n:>9}: {rates}')
+    return {
+        'meta': {'python': platform.python_version(), 'platform': platform.platform()},
+        'results': results,
+        'cases': cases,
+    }
+
+
+def _case_key(row: Dict) -> Tuple:
+    return row['engine'], row['distribution'], row['size']
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.25) -> List[str]:
+    '''
+    Find the regressions of a run against a baseline run.
+
+    Only the cases present in both runs are compared.
+
+    The rotation counts do not depend on timing, so any increase of them is
+    a regression.
+
+    :param tolerance: The allowed relative loss of throughput and gain of memory.
+    :return: A description of each regression.
+    '''
+    if tolerance < 0:
+        raise ValueError(f'tolerance must not be negative, got {tolerance}')
+    regressions = []
+    old_rates = dict((_case_key(row) + (row['operation'],), row['ops_per_sec']) for row in baseline['results'])
+    for row in current['results']:
+        old = old_rates.get(_case_key(row) + (row['operation'],))
+        if old is not None and row['ops_per_sec'] is not None and row['ops_per_sec'] < old * (1 - tolerance):
+            regressions.append(
+                f'{" ".join(map(str, _case_key(row)))} {row["operation"]}: '
+                f'{row["ops_per_sec"]:.3g} ops/s, was {old:.3g}'
+            )
+
+    old_cases = dict((_case_key(case), case) for case in baseline['cases'])
+    for case in current['cases']:
+        old = old_cases.get(_case_key(case))
+        if old is None:
+            continue
+        for field, allowed in (('peak_bytes', tolerance), ('insert_rotations', 0), ('remove_rotations', 0)):
+            if case[field] is not None and old[field] is not None and case[field] > old[field] * (1 + allowed):
+                regressions.append(f'{" ".join(map(str, _case_key(case)))} {field}: {case[field]}, was {old[field]}')
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.suite', description=__doc__.split('\n\n')[0].strip())
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--distributions', nargs='+', choices=DISTRIBUTIONS, default=DISTRIBUTIONS)
+    parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per case, the fastest is kept')
+    parser.add_argument('--no-memory', action='store_true', help='skip the (slow) peak memory measurement')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    parser.add_argument('--baseline', help='compare the results with this JSON file')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = run(tuple(args.sizes), tuple(args.distributions), tuple(args.engines), not args.no_memory, args.repeat, print)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f'REGRESSION {regression}')
+        if regressions:
+            return 1
+        print('No regressions')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
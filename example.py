@@ -38,8 +38,8 @@ def example_insert(t):
     print('Replaced value at key 1 with "new_value":')
     print(t)
 
-    t.insert('new_key', 'another_value')
-    print('Inserted value "new_value" with key "new_key":')
+    t.insert(10, 'another_value')
+    print('Inserted value "another_value" with key 10:')
     print(t)
 
 
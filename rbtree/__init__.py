@@ -1,3 +1,13 @@
 from ._rbtree import RBTree
 from ._rbtree_node import RBTreeNode
 from ._rbtree_color import RBTreeColor
+from ._array_rbtree import ArrayRBTree
+from ._engines import ENGINES, create_tree
+from ._rbtree_views import RBTreeItemsView, RBTreeKeysView, RBTreeValuesView
+from ._rbtree_cursor import RBTreeCursor
+from ._persistent_rbtree import PersistentRBTree
+from ._concurrent_rbtree import ConcurrentRBTree
+from ._async_rbtree import AsyncRBTree
+from ._rbtree_file import MappedRBTree
+from ._rbtree_stats import OperationStats, RBTreeStats
+from ._rbtree_cache import RBTreeCache
@@ -0,0 +1,412 @@
+from array import array
+from typing import Any, Iterable, Mapping, Optional, Tuple, Union
+
+from ._rbtree_color import RBTreeColor
+from ._rbtree_views import mapping_items
+
+
+_NIL = 0
+
+
+class ArrayRBTree:
+    '''
+    A red-black tree over numeric keys stored as a struct of arrays.
+
+    Keys, colors and the left/right/parent links live in parallel arrays
+    indexed by integer slot, so a node costs a few machine words instead of a
+    Python object. Slot 0 is the NIL sentinel. Slots of removed nodes are
+    chained through ``_left`` into a free list and reused by later inserts.
+
+    Keys are converted to the typecode before they are compared, so keys
+    that convert to the same value, such as ``2 ** 53`` and ``2 ** 53 + 1``
+    as doubles, are one key.
+
+    :param items: A mapping or an iterable of ``(key, value)`` pairs to insert.
+    :param typecode: The :mod:`array` typecode of the keys (``'q'`` for ints,
+        ``'d'`` for floats).
+    '''
+
+    def __init__(
+        self,
+        items: Optional[Union[Mapping, Iterable[Tuple[Any, Any]]]] = None,
+        typecode: str = 'q',
+    ) -> None:
+        self._keys = array(typecode, [0])
+        # A scratch cell that converts keys to the typecode.
+        self._probe = array(typecode, [0])
+        self._values = [None]
+        self._left = array('i', [_NIL])
+        self._right = array('i', [_NIL])
+        self._parent = array('i', [_NIL])
+        self._red = bytearray(1)
+        self._root = _NIL
+        self._free = _NIL
+        self._len = 0
+        self._rotations = 0
+        if items is not None:
+            for k, v in mapping_items(items):
+                self[k] = v
+
+    def __getitem__(self, key):
+        '''Get value by key.'''
+        return self._values[self._get_slot(key, True)]
+
+    def __setitem__(self, key, value: Any) -> None:
+        '''Insert a new node or rewrite existing.'''
+        key = self._convert(key)
+        keys, left, right = self._keys, self._left, self._right
+        parent = _NIL
+        current = self._root
+        while current:
+            parent = current
+            k = keys[current]
+            if key < k:
+                current = left[current]
+            elif key > k:
+                current = right[current]
+            else:
+                self._values[current] = value
+                return
+
+        slot = self._new_slot(key, value, parent)
+        if not parent:
+            self._root = slot
+        elif key < keys[parent]:
+            left[parent] = slot
+        else:
+            right[parent] = slot
+
+        self._fix_insert(slot)
+        self._len += 1
+
+    def __delitem__(self, key) -> None:
+        '''Delete node.'''
+        self._delete(self._get_slot(key, True))
+        self._len -= 1
+
+    def __contains__(self, key) -> bool:
+        return bool(self._get_slot(key))
+
+    def __len__(self):
+        '''Get the number of nodes.'''
+        return self._len
+
+    def __str__(self):
+        items = ', '.join(f'{repr(k)}: {repr(v)}' for k, v in self.items())
+        return f'{self.__class__.__name__}({{{items}}})'
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __bool__(self):
+        return len(self) != 0
+
+    @property
+    def typecode(self) -> str:
+        return self._keys.typecode
+
+    @property
+    def rotations(self) -> int:
+        '''Get the number of rotations done by the rebalancing so far.'''
+        return self._rotations
+
+    @property
+    def height(self):
+        '''Get tree height.'''
+        height = 0
+        stack = [(self._root, 1)] if self._root else []
+        while stack:
+            slot, h = stack.pop()
+            height = max(height, h)
+            for child in (self._left[slot], self._right[slot]):
+                if child:
+                    stack.append((child, h + 1))
+        return height
+
+    def get(self, key, default: Any = None) -> Any:
+        slot = self._get_slot(key)
+        return self._values[slot] if slot else default
+
+    def items(self):
+        for slot in self._traverse_inorder():
+            yield self._keys[slot], self._values[slot]
+
+    def keys(self):
+        return tuple(self._keys[slot] for slot in self._traverse_inorder())
+
+    def values(self):
+        return tuple(self._values[slot] for slot in self._traverse_inorder())
+
+    def print_tree(self):
+        stack = [(self._root, '', '--> ')] if self._root else []
+        while stack:
+            slot, indent, branch = stack.pop()
+            color = RBTreeColor.RED if self._red[slot] else RBTreeColor.BLACK
+            print(f'{indent}{branch}{repr(self._keys[slot])}:{repr(self._values[slot])} ({color.name})')
+            indent += '│   ' if branch == '├─L ' else '    '
+            if self._right[slot]:
+                stack.append((self._right[slot], indent, '└─R '))
+            if self._left[slot]:
+                stack.append((self._left[slot], indent, '├─L '))
+
+    # Task methods (start)
+
+    def insert(self, key, value: Any):
+        self[key] = value
+
+    def remove(self, key):
+        del self[key]
+
+    def find(self, key):
+        return self[key]
+
+    def clear(self):
+        rotations = self._rotations
+        self.__init__(typecode=self.typecode)
+        self._rotations = rotations
+
+    def get_keys(self):
+        return self.keys()
+
+    def get_values(self):
+        return self.values()
+
+    def print(self):
+        print(self)
+
+    # Task methods (end)
+
+    def _get_slot(self, key, raise_error: bool = False) -> int:
+        '''
+        Get the slot of a key.
+
+        :param key: The key of the node.
+        :param raise_error: If true, raise a KeyError if node with given key was not found.
+        :raises KeyError: If node with given key was not found.
+        :return: The slot of the node if exists, else 0.
+        '''
+        try:
+            stored = self._convert(key)
+        except OverflowError:
+            stored = None
+        keys, left, right = self._keys, self._left, self._right
+        current = self._root if stored is not None else _NIL
+        while current:
+            k = keys[current]
+            if stored < k:
+                current = left[current]
+            elif stored > k:
+                current = right[current]
+            else:
+                return current
+        if raise_error:
+            raise KeyError(key)
+        return _NIL
+
+    def _convert(self, key):
+        '''
+        Get a key as the typecode stores it.
+
+        :raises OverflowError: If the key is out of the range of the typecode.
+        :raises TypeError: If the key is not a number of the typecode.
+        '''
+        probe = self._probe
+        probe[0] = key
+        return probe[0]
+
+    def _new_slot(self, key, value: Any, parent: int) -> int:
+        slot = self._free
+        if slot:
+            self._keys[slot] = key
+            self._free = self._left[slot]
+            self._values[slot] = value
+            self._left[slot] = self._right[slot] = _NIL
+            self._parent[slot] = parent
+            self._red[slot] = 1
+        else:
+            slot = len(self._keys)
+            self._keys.append(key)
+            self._values.append(value)
+            self._left.append(_NIL)
+            self._right.append(_NIL)
+            self._parent.append(parent)
+            self._red.append(1)
+        return slot
+
+    def _free_slot(self, slot: int) -> None:
+        self._values[slot] = None
+        self._left[slot] = self._free
+        self._free = slot
+
+    def _traverse_inorder(self):
+        left, right = self._left, self._right
+        stack = []
+        slot = self._root
+        while stack or slot:
+            while slot:
+                stack.append(slot)
+                slot = left[slot]
+            slot = stack.pop()
+            yield slot
+            slot = right[slot]
+
+    def _left_rotate(self, x: int) -> None:
+        left, right, parent = self._left, self._right, self._parent
+        y = right[x]
+        right[x] = left[y]
+        if left[y]:
+            parent[left[y]] = x
+        p = parent[x]
+        parent[y] = p
+        if not p:
+            self._root = y
+        elif x == left[p]:
+            left[p] = y
+        else:
+            right[p] = y
+        left[y] = x
+        parent[x] = y
+        self._rotations += 1
+
+    def _right_rotate(self, x: int) -> None:
+        left, right, parent = self._left, self._right, self._parent
+        y = left[x]
+        left[x] = right[y]
+        if right[y]:
+            parent[right[y]] = x
+        p = parent[x]
+        parent[y] = p
+        if not p:
+            self._root = y
+        elif x == right[p]:
+            right[p] = y
+        else:
+            left[p] = y
+        right[y] = x
+        parent[x] = y
+        self._rotations += 1
+
+    def _fix_insert(self, z: int) -> None:
+        left, right, parent, red = self._left, self._right, self._parent, self._red
+        while red[parent[z]]:
+            p = parent[z]
+            g = parent[p]
+            if p == left[g]:
+                u = right[g]
+                if red[u]:
+                    red[p] = red[u] = 0
+                    red[g] = 1
+                    z = g
+                    continue
+                if z == right[p]:
+                    z = p
+                    self._left_rotate(z)
+                    p = parent[z]
+                red[p] = 0
+                red[g] = 1
+                self._right_rotate(g)
+            else:
+                u = left[g]
+                if red[u]:
+                    red[p] = red[u] = 0
+                    red[g] = 1
+                    z = g
+                    continue
+                if z == left[p]:
+                    z = p
+                    self._right_rotate(z)
+                    p = parent[z]
+                red[p] = 0
+                red[g] = 1
+                self._left_rotate(g)
+        red[self._root] = 0
+
+    def _transplant(self, u: int, v: int) -> None:
+        parent = self._parent
+        p = parent[u]
+        if not p:
+            self._root = v
+        elif u == self._left[p]:
+            self._left[p] = v
+        else:
+            self._right[p] = v
+        parent[v] = p
+
+    def _delete(self, z: int) -> None:
+        left, right, parent, red = self._left, self._right, self._parent, self._red
+        y = z
+        y_red = red[y]
+        if not left[z]:
+            x = right[z]
+            self._transplant(z, x)
+        elif not right[z]:
+            x = left[z]
+            self._transplant(z, x)
+        else:
+            y = right[z]
+            while left[y]:
+                y = left[y]
+            y_red = red[y]
+            x = right[y]
+            if parent[y] == z:
+                parent[x] = y
+            else:
+                self._transplant(y, x)
+                right[y] = right[z]
+                parent[right[y]] = y
+            self._transplant(z, y)
+            left[y] = left[z]
+            parent[left[y]] = y
+            red[y] = red[z]
+        if not y_red:
+            self._fix_delete(x)
+        parent[_NIL] = _NIL
+        self._free_slot(z)
+
+    def _fix_delete(self, x: int) -> None:
+        left, right, parent, red = self._left, self._right, self._parent, self._red
+        while x != self._root and not red[x]:
+            p = parent[x]
+            if x == left[p]:
+                w = right[p]
+                if red[w]:
+                    red[w] = 0
+                    red[p] = 1
+                    self._left_rotate(p)
+                    w = right[p]
+                if not red[left[w]] and not red[right[w]]:
+                    red[w] = 1
+                    x = p
+                    continue
+                if not red[right[w]]:
+                    red[left[w]] = 0
+                    red[w] = 1
+                    self._right_rotate(w)
+                    w = right[p]
+                red[w] = red[p]
+                red[p] = 0
+                red[right[w]] = 0
+                self._left_rotate(p)
+                x = self._root
+            else:
+                w = left[p]
+                if red[w]:
+                    red[w] = 0
+                    red[p] = 1
+                    self._right_rotate(p)
+                    w = left[p]
+                if not red[left[w]] and not red[right[w]]:
+                    red[w] = 1
+                    x = p
+                    continue
+                if not red[left[w]]:
+                    red[right[w]] = 0
+                    red[w] = 1
+                    self._left_rotate(w)
+                    w = left[p]
+                red[w] = red[p]
+                red[p] = 0
+                red[left[w]] = 0
+                self._right_rotate(p)
+                x = self._root
+        red[x] = 0
@@ -0,0 +1,129 @@
+import asyncio
+from concurrent.futures import Executor
+from functools import partial
+from typing import Any, AsyncIterator, Callable, Hashable, Iterable, List, Mapping, Optional, Tuple, Union
+
+from ._rbtree import RBTree
+from ._rbtree_node import RBTreeNode
+from ._rbtree_views import mapping_items
+
+
+class AsyncRBTree:
+    '''
+    An asyncio facade over an :class:`RBTree`.
+
+    Point operations take O(log n) and stay synchronous. Operations over the
+    whole tree are coroutines and ``async for`` iterators that give control
+    back to the event loop every ``yield_every`` nodes, so a large tree does
+    not hold up the other tasks of the loop.
+
+    Changing the tree while one of them is suspended raises a RuntimeError
+    in it, as with any iteration over an :class:`RBTree`.
+
+    :param tree: The tree to wrap, a new empty one if None.
+    :param yield_every: The number of nodes visited between yields to the loop.
+    '''
+
+    def __init__(self, tree: Optional[RBTree] = None, yield_every: int = 1024) -> None:
+        if yield_every < 1:
+            raise ValueError(f'yield_every must be positive, got {yield_every}')
+        self._tree = RBTree() if tree is None else tree
+        self.yield_every = yield_every
+
+    @classmethod
+    async def from_items(
+        cls,
+        items: Union[Mapping, Iterable[Tuple[Hashable, Any]]],
+        presorted: bool = False,
+        key: Optional[Callable[[Hashable], Any]] = None,
+        executor: Optional[Executor] = None,
+        yield_every: int = 1024,
+    ) -> 'AsyncRBTree':
+        '''
+        Build a tree with :meth:`RBTree.from_items` in an executor.
+
+        The new tree is not shared with the loop until it is built, so the
+        build runs in a worker thread while the loop serves other tasks.
+
+        :param executor: The executor to build in, the default thread pool
+            of the loop if None.
+        '''
+        if hasattr(items, 'keys'):
+            items = list(mapping_items(items))
+        build = partial(RBTree.from_items, items, presorted, key)
+        tree = await asyncio.get_running_loop().run_in_executor(executor, build)
+        return cls(tree, yield_every)
+
+    def __getitem__(self, key: Hashable):
+        '''Get value by key.'''
+        return self._tree[key]
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        '''Insert a new node or rewrite existing.'''
+        self._tree[key] = value
+
+    def __delitem__(self, key: Hashable):
+        '''Delete node.'''
+        del self._tree[key]
+
+    def __len__(self):
+        '''Get the number of nodes.'''
+        return len(self._tree)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._tree
+
+    def __bool__(self):
+        return len(self) != 0
+
+    def __aiter__(self) -> AsyncIterator[Hashable]:
+        return self.iter_keys()
+
+    @property
+    def tree(self) -> RBTree:
+        '''Get the wrapped tree.'''
+        return self._tree
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self._tree.get(key, default)
+
+    async def iter_keys(self, reverse: bool = False) -> AsyncIterator[Hashable]:
+        async for node in self._iter_nodes(reverse):
+            yield node.key
+
+    async def iter_values(self, reverse: bool = False) -> AsyncIterator[Any]:
+        async for node in self._iter_nodes(reverse):
+            yield node.value
+
+    async def iter_items(self, reverse: bool = False) -> AsyncIterator[Tuple[Hashable, Any]]:
+        async for node in self._iter_nodes(reverse):
+            yield node.key, node.value
+
+    async def keys(self) -> Tuple[Hashable, ...]:
+        return tuple([k async for k in self.iter_keys()])
+
+    async def values(self) -> Tuple[Any, ...]:
+        return tuple([v async for v in self.iter_values()])
+
+    async def items(self) -> List[Tuple[Hashable, Any]]:
+        return [item async for item in self.iter_items()]
+
+    async def to_string(self) -> str:
+        '''Get ``str()`` of the tree.'''
+        items = [f'{repr(k)}: {repr(v)}' async for k, v in self.iter_items()]
+        return f'{self._tree.__class__.__name__}({{{", ".join(items)}}})'
+
+    async def get_dot_string(self) -> str:
+        '''Get :meth:`RBTree.get_dot_string` of the tree.'''
+        lines = [node.get_graphviz() async for node in self._iter_nodes()]
+        return f'graph {{\n{"".join(lines)}}}'
+
+    async def clear(self) -> None:
+        self._tree.clear()
+
+    async def _iter_nodes(self, reverse: bool = False) -> AsyncIterator[RBTreeNode]:
+        every = self.yield_every
+        for i, node in enumerate(self._tree._iter_nodes(reverse), 1):
+            yield node
+            if not i % every:
+                await asyncio.sleep(0)
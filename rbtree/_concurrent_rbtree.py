@@ -0,0 +1,288 @@
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from typing import Any, Callable, Hashable, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+from ._persistent_rbtree import PersistentRBTree
+from ._rbtree import RBTree
+from ._rbtree_views import mapping_items
+
+
+class _RWLock:
+    '''
+    A lock held by any number of readers or by one writer.
+
+    Writers are preferred: once a writer waits, new readers wait for it, so
+    a steady stream of readers cannot starve writers.
+    '''
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire_read(self) -> None:
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            if not self._readers:
+                self._cond.notify_all()
+
+    def acquire_write(self) -> None:
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+
+    def release_write(self) -> None:
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+
+class _Write:
+    __slots__ = ('func', 'args', 'done', 'result', 'error')
+
+    def __init__(self, func: Callable, args: Tuple) -> None:
+        self.func = func
+        self.args = args
+        self.done = False
+        self.result = None
+        self.error = None
+
+
+class ConcurrentRBTree:
+    '''
+    A thread-safe sorted map around an :class:`RBTree`.
+
+    Reads share a reader-writer lock, so they run alongside each other and
+    only wait for writes. Writes are combined: the first writer to find no
+    batch in progress takes the write lock and applies the writes of every
+    thread that queued one meanwhile, so readers are held up once per batch
+    instead of once per write.
+
+    Iteration goes over a snapshot of the tree taken when it starts, so it
+    sees one consistent version however the tree changes meanwhile. The
+    snapshot is read ``chunk_size`` keys per read lock. Taking a snapshot
+    registers it with the tree, so readers take them one at a time.
+
+    The constructor takes the arguments of :class:`RBTree`.
+    '''
+
+    chunk_size = 256
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        self._tree = RBTree(*args, **kwargs)
+        self._lock = _RWLock()
+        self._snapshot_lock = threading.Lock()
+        self._queue = threading.Condition(threading.Lock())
+        self._pending = []
+        self._combining = False
+
+    def __getitem__(self, key: Hashable):
+        '''Get value by key.'''
+        return self._read(self._tree.__getitem__, key)
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        '''Insert a new node or rewrite existing.'''
+        self._write(self._tree.__setitem__, key, value)
+
+    def __delitem__(self, key: Hashable):
+        '''Delete node.'''
+        self._write(self._tree.__delitem__, key)
+
+    def __len__(self):
+        '''Get the number of nodes.'''
+        return self._read(self._tree.__len__)
+
+    def __str__(self):
+        items = ', '.join(f'{repr(k)}: {repr(v)}' for k, v in self.items())
+        return f'{self.__class__.__name__}({{{items}}})'
+
+    def __iter__(self):
+        return self.keys()
+
+    def __reversed__(self):
+        return self._iter_snapshot(reversed)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._read(self._tree.__contains__, key)
+
+    def __bool__(self):
+        return len(self) != 0
+
+    @property
+    def key(self) -> Optional[Callable[[Hashable], Any]]:
+        '''Get the key function the tree is ordered by.'''
+        return self._tree.key
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        return self._read(self._tree.get, key, default)
+
+    def keys(self) -> Iterator[Hashable]:
+        '''Iterate over the keys of a snapshot in sorted order.'''
+        return self._iter_snapshot(iter)
+
+    def values(self) -> Iterator[Any]:
+        '''Iterate over the values of a snapshot in the order of their keys.'''
+        return self._iter_snapshot(lambda snapshot: iter(snapshot.values()))
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        '''Iterate over the ``(key, value)`` pairs of a snapshot in sorted order.'''
+        return self._iter_snapshot(lambda snapshot: iter(snapshot.items()))
+
+    def min(self) -> Hashable:
+        return self._read(self._tree.min)
+
+    def max(self) -> Hashable:
+        return self._read(self._tree.max)
+
+    def floor(self, key: Hashable) -> Optional[Hashable]:
+        return self._read(self._tree.floor, key)
+
+    def ceiling(self, key: Hashable) -> Optional[Hashable]:
+        return self._read(self._tree.ceiling, key)
+
+    def lower(self, key: Hashable) -> Optional[Hashable]:
+        return self._read(self._tree.lower, key)
+
+    def higher(self, key: Hashable) -> Optional[Hashable]:
+        return self._read(self._tree.higher, key)
+
+    def update(self, items: Union[Mapping, Iterable[Tuple[Hashable, Any]]]) -> None:
+        '''Insert or rewrite a batch of ``(key, value)`` pairs at once.'''
+        keys, values = [], []
+        for k, v in mapping_items(items):
+            keys.append(k)
+            values.append(v)
+        self._write(self._tree.insert_many, keys, values)
+
+    @contextmanager
+    def batch(self) -> Iterator[RBTree]:
+        '''
+        Hold the write lock and get the underlying tree.
+
+        Changes made to the tree in the ``with`` block are seen by other
+        threads all at once::
+
+            with tree.batch() as t:
+                t.remove_range(lo, hi)
+                t[lo] = merged
+        '''
+        self._lock.acquire_write()
+        try:
+            yield self._tree
+        finally:
+            self._lock.release_write()
+
+    # Task methods (start)
+
+    def insert(self, key: Hashable, value: Any):
+        self[key] = value
+
+    def remove(self, key: Hashable):
+        del self[key]
+
+    def find(self, key: Hashable):
+        return self[key]
+
+    def clear(self):
+        self._write(self._tree.clear)
+
+    def get_keys(self):
+        return tuple(self.keys())
+
+    def get_values(self):
+        return tuple(self.values())
+
+    def print(self):
+        print(self)
+
+    # Task methods (end)
+
+    def _read(self, func: Callable, *args: Any) -> Any:
+        lock = self._lock
+        lock.acquire_read()
+        try:
+            return func(*args)
+        finally:
+            lock.release_read()
+
+    def _write(self, func: Callable, *args: Any) -> Any:
+        '''
+        Queue a write and wait until some thread applies it.
+
+        The thread that finds no batch in progress applies the queued writes
+        under the write lock until the queue is empty.
+
+        :return: The result of ``func``.
+        :raises Exception: Whatever ``func`` raises.
+        '''
+        write = _Write(func, args)
+        queue = self._queue
+        with queue:
+            self._pending.append(write)
+            while not write.done and self._combining:
+                queue.wait()
+            combine = not write.done
+            if combine:
+                self._combining = True
+
+        if combine:
+            self._lock.acquire_write()
+            try:
+                while True:
+                    with queue:
+                        batch, self._pending = self._pending, []
+                    if not batch:
+                        break
+                    self._apply(batch)
+                    with queue:
+                        queue.notify_all()
+            finally:
+                with queue:
+                    self._combining = False
+                    queue.notify_all()
+                self._lock.release_write()
+
+        if write.error is not None:
+            raise write.error
+        return write.result
+
+    @staticmethod
+    def _apply(batch: List[_Write]) -> None:
+        for write in batch:
+            try:
+                write.result = write.func(*write.args)
+            except Exception as error:
+                write.error = error
+            write.done = True
+
+    def _take_snapshot(self) -> PersistentRBTree:
+        '''Take a snapshot under the read lock, which does not exclude other readers.'''
+        with self._snapshot_lock:
+            return self._tree.snapshot()
+
+    def _iter_snapshot(self, iterate: Callable[[PersistentRBTree], Iterator]) -> Iterator:
+        '''
+        Iterate over a snapshot of the tree in chunks.
+
+        Until the tree is first changed, a snapshot reads the nodes of the
+        tree, so each chunk is read under the read lock.
+        '''
+        snapshot = self._read(self._take_snapshot)
+        it = iterate(snapshot)
+        while snapshot._source is not None:
+            chunk = self._read(list, islice(it, self.chunk_size))
+            if not chunk:
+                return
+            yield from chunk
+        yield from it
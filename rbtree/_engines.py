@@ -0,0 +1,27 @@
+from typing import Any
+
+from ._array_rbtree import ArrayRBTree
+from ._rbtree import RBTree
+
+
+ENGINES = {
+    'node': RBTree,
+    'array': ArrayRBTree,
+}
+
+
+def create_tree(engine: str = 'node', *args: Any, **kwargs: Any):
+    '''
+    Create a tree backed by the given engine.
+
+    :param engine: ``'node'`` for :class:`RBTree` (any hashable keys) or
+        ``'array'`` for :class:`ArrayRBTree` (int or float keys).
+    :param args: Passed to the engine constructor.
+    :param kwargs: Passed to the engine constructor.
+    :raises ValueError: If the engine is unknown.
+    '''
+    try:
+        cls = ENGINES[engine]
+    except KeyError:
+        raise ValueError(f'Unknown engine {engine!r}, expected one of {tuple(ENGINES)}') from None
+    return cls(*args, **kwargs)
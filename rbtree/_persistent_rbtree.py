@@ -0,0 +1,483 @@
+from typing import Any, Callable, Hashable, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from ._rbtree_views import RBTreeItemsView, RBTreeKeysView, RBTreeValuesView, mapping_items
+
+
+class _PersistentNode:
+    '''
+    A node of a persistent tree.
+
+    Nodes have no parent pointer, so one node can belong to many versions of
+    a tree. A node may only be changed by the update that created it, which
+    is recorded in ``owner``.
+    '''
+
+    __slots__ = ('key', 'value', 'sort_key', 'left', 'right', 'red', 'owner')
+
+    def __init__(
+        self,
+        key: Hashable,
+        value: Any,
+        sort_key: Any,
+        left: Optional['_PersistentNode'] = None,
+        right: Optional['_PersistentNode'] = None,
+        red: bool = True,
+        owner: Optional[object] = None,
+    ) -> None:
+        self.key = key
+        self.value = value
+        self.sort_key = sort_key
+        self.left = left
+        self.right = right
+        self.red = red
+        self.owner = owner
+
+
+def _own(node: Any, owner: object) -> _PersistentNode:
+    '''Get a node that the update ``owner`` may change: the node itself or its copy.'''
+    if node.owner is owner:
+        return node
+    return _PersistentNode(node.key, node.value, node.sort_key, node.left, node.right, node.red, owner)
+
+
+def _child(node: _PersistentNode, right: bool) -> Optional[_PersistentNode]:
+    return node.right if right else node.left
+
+
+def _set_child(node: _PersistentNode, right: bool, child: Optional[_PersistentNode]) -> None:
+    if right:
+        node.right = child
+    else:
+        node.left = child
+
+
+def _rotate(node: _PersistentNode, right: bool) -> _PersistentNode:
+    '''
+    Rotate an owned node and its owned child on the other side.
+
+    :param right: The direction of the rotation.
+    :return: The new root of the subtree.
+    '''
+    pivot = _child(node, not right)
+    _set_child(node, not right, _child(pivot, right))
+    _set_child(pivot, right, node)
+    return pivot
+
+
+class PersistentRBTree:
+    '''
+    An immutable sorted map based on a red-black tree.
+
+    ``insert`` and ``remove`` return a new tree and leave the old one as it
+    was. The new tree shares every node off the path to the changed key with
+    the old one, so an update creates O(log n) nodes and old versions cost
+    nothing to keep.
+
+    The constructor and the key function work as in :class:`RBTree`.
+    '''
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        given = len(args)
+        if args and (args[0] is None or callable(args[0])):
+            self._key, args = args[0], args[1:]
+        else:
+            self._key = None
+        if len(args) > 1:
+            limit = given - len(args) + 1
+            raise TypeError(
+                f'{self.__class__.__name__} expected at most {limit} positional '
+                f'argument{"s" if limit > 1 else ""}, got {given}'
+            )
+
+        self._root = None
+        self._len = 0
+        self._source = None
+        items = ()
+        if args:
+            items = mapping_items(args[0])
+        owner = object()
+        for pairs in (items, kwargs.items()):
+            for k, v in pairs:
+                self._root, added = self._insert(self._root, owner, k, v)
+                self._len += added
+
+    @classmethod
+    def _from_nodes(
+        cls,
+        nodes: Iterable[Any],
+        length: int,
+        key: Optional[Callable[[Hashable], Any]],
+    ) -> 'PersistentRBTree':
+        '''
+        Build a tree from nodes of any kind in tree order in O(n).
+
+        The layout is the one of ``RBTree._build``: every node gets the middle
+        of its range as the subtree root, and the last level is red unless it
+        is full.
+
+        :param nodes: Nodes with ``key``, ``value`` and ``sort_key``.
+        :param length: The number of nodes.
+        :param key: The key function of the tree.
+        '''
+        nodes = iter(nodes)
+        red_depth = length.bit_length() - 1 if (length + 1) & length else -1
+
+        def link(n: int, depth: int) -> Optional[_PersistentNode]:
+            if not n:
+                return None
+            left = link(n // 2, depth + 1)
+            node = next(nodes)
+            return _PersistentNode(
+                node.key, node.value, node.sort_key, left, link(n - n // 2 - 1, depth + 1), depth == red_depth,
+            )
+
+        tree = cls(key)
+        tree._root = link(length, 0)
+        tree._len = length
+        return tree
+
+    def __getitem__(self, key: Hashable):
+        '''Get value by key.'''
+        node = self._get_node(key, True)
+        return node.value
+
+    def __len__(self):
+        '''Get the number of nodes.'''
+        return self._len
+
+    def __str__(self):
+        items = ', '.join(f'{repr(k)}: {repr(v)}' for k, v in self.items())
+        return f'{self.__class__.__name__}({{{items}}})'
+
+    def __iter__(self):
+        for node in self._iter_nodes():
+            yield node.key
+
+    def __reversed__(self):
+        for node in self._iter_nodes(reverse=True):
+            yield node.key
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._get_node(key) is not None
+
+    def __bool__(self):
+        return len(self) != 0
+
+    @property
+    def key(self) -> Optional[Callable[[Hashable], Any]]:
+        '''Get the key function the tree is ordered by.'''
+        return self._key
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        node = self._get_node(key)
+        return default if node is None else node.value
+
+    def items(self) -> RBTreeItemsView:
+        return RBTreeItemsView(self)
+
+    def keys(self) -> RBTreeKeysView:
+        return RBTreeKeysView(self)
+
+    def values(self) -> RBTreeValuesView:
+        return RBTreeValuesView(self)
+
+    def min(self) -> Hashable:
+        '''
+        Get the smallest key.
+
+        :raises ValueError: If the tree is empty.
+        '''
+        if not self:
+            raise ValueError('min() of an empty tree')
+        node = self._root
+        while node.left:
+            node = node.left
+        return node.key
+
+    def max(self) -> Hashable:
+        '''
+        Get the largest key.
+
+        :raises ValueError: If the tree is empty.
+        '''
+        if not self:
+            raise ValueError('max() of an empty tree')
+        node = self._root
+        while node.right:
+            node = node.right
+        return node.key
+
+    def insert(self, key: Hashable, value: Any) -> 'PersistentRBTree':
+        '''
+        Get a new tree with a key inserted or its value rewritten in O(log n).
+        '''
+        root, added = self._insert(self._get_root(), object(), key, value)
+        return self._derive(root, self._len + added)
+
+    def remove(self, key: Hashable) -> 'PersistentRBTree':
+        '''
+        Get a new tree without a key in O(log n).
+
+        :raises KeyError: If the key is not in the tree.
+        '''
+        return self._derive(self._remove(self._get_root(), object(), key), self._len - 1)
+
+    def _derive(self, root: Optional[_PersistentNode], length: int) -> 'PersistentRBTree':
+        tree = self.__class__(self._key)
+        tree._root = root
+        tree._len = length
+        return tree
+
+    def _get_root(self) -> Any:
+        '''Get the root, first copying the nodes of a live tree this tree is a snapshot of.'''
+        if self._source is not None:
+            self._source._detach_snapshots()
+        return self._root
+
+    def _get_sort_key(self, key: Hashable) -> Any:
+        if self._key is None:
+            return key
+        return self._key(key)
+
+    def _get_node(self, key: Hashable, raise_error: bool = False) -> Any:
+        '''
+        Get node by key.
+
+        :param key: The key of the node.
+        :param raise_error: If true, raise a KeyError if node with given key was not found.
+        :raises KeyError: If node with given key was not found.
+        :return: The node if exists, else None.
+        '''
+        sort_key = self._get_sort_key(key)
+        node = self._root
+        while node:
+            if sort_key < node.sort_key:
+                node = node.left
+            elif node.sort_key < sort_key:
+                node = node.right
+            else:
+                return node
+        if raise_error:
+            raise KeyError(key)
+        return None
+
+    def _iter_nodes(self, reverse: bool = False) -> Iterator[Any]:
+        '''
+        Iterate over the nodes in order with a stack of ancestors.
+
+        The nodes of a snapshot are copied when its live tree is first
+        changed. If that happens during iteration, the iteration goes on in
+        the copy after the last key it yielded.
+        '''
+        root = self._root
+        stack = []
+        node = root
+        while True:
+            while node:
+                stack.append(node)
+                node = node.right if reverse else node.left
+            if not stack:
+                return
+            node = stack.pop()
+            # The node may be a node of the live tree, whose key can change
+            # once the snapshot is detached from it.
+            sort_key = node.sort_key
+            yield node
+            if self._root is not root:
+                root = self._root
+                stack = self._path_after(root, sort_key, reverse)
+                node = None
+            else:
+                node = node.left if reverse else node.right
+
+    @staticmethod
+    def _path_after(root: Any, sort_key: Any, reverse: bool) -> List[Any]:
+        '''Get the iteration stack of the nodes after (before, if reverse) ``sort_key``.'''
+        stack = []
+        node = root
+        while node:
+            if (node.sort_key < sort_key) if reverse else (sort_key < node.sort_key):
+                stack.append(node)
+                node = node.right if reverse else node.left
+            else:
+                node = node.left if reverse else node.right
+        return stack
+
+    def _insert(
+        self,
+        root: Optional[_PersistentNode],
+        owner: object,
+        key: Hashable,
+        value: Any,
+    ) -> Tuple[_PersistentNode, int]:
+        '''
+        Insert or rewrite a key by copying the path to it.
+
+        The copies of the path stand in for parent pointers during the
+        fix-up. Nodes off the path are copied only to be recolored.
+
+        :param owner: The update; nodes it owns are changed in place.
+        :return: The new root and the number of added keys.
+        '''
+        sort_key = self._get_sort_key(key)
+        path = []
+        parent = None
+        node = root
+        right = False
+        while node:
+            node = _own(node, owner)
+            if parent is None:
+                root = node
+            else:
+                _set_child(parent, right, node)
+            if sort_key < node.sort_key:
+                right = False
+            elif node.sort_key < sort_key:
+                right = True
+            else:
+                node.value = value
+                return root, 0
+            path.append(node)
+            parent, node = node, _child(node, right)
+
+        node = _PersistentNode(key, value, sort_key, owner=owner)
+        if parent is None:
+            root = node
+        else:
+            _set_child(parent, right, node)
+
+        while path and path[-1].red:
+            parent = path.pop()
+            gparent = path.pop()
+            parent_right = gparent.right is parent
+            uncle = _child(gparent, not parent_right)
+            if uncle and uncle.red:
+                uncle = _own(uncle, owner)
+                _set_child(gparent, not parent_right, uncle)
+                parent.red = uncle.red = False
+                gparent.red = True
+                node = gparent
+                continue
+
+            if (parent.right is node) != parent_right:
+                _set_child(gparent, parent_right, _rotate(parent, parent_right))
+                parent = node
+            parent.red = False
+            gparent.red = True
+            subtree = _rotate(gparent, not parent_right)
+            if path:
+                _set_child(path[-1], path[-1].right is gparent, subtree)
+            else:
+                root = subtree
+            break
+        root.red = False
+        return root, 1
+
+    def _remove(self, root: Optional[_PersistentNode], owner: object, key: Hashable) -> Optional[_PersistentNode]:
+        '''
+        Remove a key by copying the path to it.
+
+        :param owner: The update; nodes it owns are changed in place.
+        :raises KeyError: If the key is not in the tree.
+        :return: The new root.
+        '''
+        sort_key = self._get_sort_key(key)
+        node = root
+        while node:
+            if sort_key < node.sort_key:
+                node = node.left
+            elif node.sort_key < sort_key:
+                node = node.right
+            else:
+                break
+        else:
+            raise KeyError(key)
+
+        path = []
+        parent = None
+        node = root
+        right = False
+        target = None
+        while True:
+            node = _own(node, owner)
+            if parent is None:
+                root = node
+            else:
+                _set_child(parent, right, node)
+            if target is None and not (sort_key < node.sort_key or node.sort_key < sort_key):
+                target = node
+                if not (node.left and node.right):
+                    break
+                right = True
+            elif target is not None:
+                if not node.left:
+                    target.key, target.value, target.sort_key = node.key, node.value, node.sort_key
+                    break
+                right = False
+            else:
+                right = node.sort_key < sort_key
+            path.append(node)
+            parent, node = node, _child(node, right)
+
+        child = node.left or node.right
+        if parent is None:
+            root = child
+        else:
+            _set_child(parent, right, child)
+        if node.red:
+            return root
+        if child and child.red:
+            child = _own(child, owner)
+            child.red = False
+            if parent is None:
+                return child
+            _set_child(parent, right, child)
+            return root
+
+        node = child
+        while path:
+            parent = path.pop()
+            right = parent.right is node if node else parent.right is None
+            sibling = _own(_child(parent, not right), owner)
+            _set_child(parent, not right, sibling)
+            if sibling.red:
+                sibling.red = False
+                parent.red = True
+                subtree = _rotate(parent, right)
+                if path:
+                    _set_child(path[-1], path[-1].right is parent, subtree)
+                else:
+                    root = subtree
+                path.append(subtree)
+                sibling = _own(_child(parent, not right), owner)
+                _set_child(parent, not right, sibling)
+
+            near, far = _child(sibling, right), _child(sibling, not right)
+            if not (near and near.red) and not (far and far.red):
+                sibling.red = True
+                if parent.red:
+                    parent.red = False
+                    return root
+                node = parent
+                continue
+
+            if not (far and far.red):
+                near = _own(near, owner)
+                near.red = False
+                sibling.red = True
+                _set_child(sibling, right, near)
+                _set_child(parent, not right, _rotate(sibling, not right))
+                sibling, far = near, sibling
+            else:
+                far = _own(far, owner)
+                _set_child(sibling, not right, far)
+            sibling.red = parent.red
+            parent.red = False
+            far.red = False
+            subtree = _rotate(parent, right)
+            if path:
+                _set_child(path[-1], path[-1].right is parent, subtree)
+            else:
+                root = subtree
+            return root
+        return root
@@ -1,43 +1,233 @@
-from typing import Any, Hashable, Optional, Union
+from math import ceil
+from operator import attrgetter, itemgetter
+import os
+import sys
+from time import perf_counter
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Mapping, Optional, TextIO, Tuple, Union
+from weakref import WeakSet
 
-from ._rbtree_node import RBTreeNode, RBTreeColor
+from . import _rbtree_file
+
+from ._persistent_rbtree import PersistentRBTree
+from ._rbtree_cursor import RBTreeCursor
+from ._rbtree_node import NIL, RBTreeNode, RBTreeColor
+from ._rbtree_stats import RBTreeStats
+from ._rbtree_views import RBTreeItemsView, RBTreeKeysView, RBTreeValuesView, mapping_items
 
 
 class RBTree:
-    def __init__(self, **kwargs: Any) -> None:
+    '''
+    A sorted map based on a red-black tree.
+
+    Keys are ordered by their own ``<``. Like ``sorted()``, the tree takes an
+    optional key function as the first positional argument, and keys are
+    ordered (and considered equal) by its results instead. Passing ``hash``
+    orders keys by their hashes, so keys with equal hashes replace each other.
+
+    The rest of the arguments fill the tree as ``dict`` does::
+
+        RBTree(a=1, b=2)
+        RBTree({'a': 1, 'b': 2})
+        RBTree(str.lower, [('a', 1), ('B', 2)])
+        RBTree(other_tree)
+    '''
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        given = len(args)
+        if args and (args[0] is None or callable(args[0])):
+            self._key, args = args[0], args[1:]
+        else:
+            self._key = None
+        if len(args) > 1:
+            limit = given - len(args) + 1
+            raise TypeError(
+                f'{self.__class__.__name__} expected at most {limit} positional '
+                f'argument{"s" if limit > 1 else ""}, got {given}'
+            )
+
         self._len = 0
-        self._root = RBTreeNode()
+        self._root = NIL
+        self._black_height = 0
+        self._sized = False
+        self._index = None
+        self._version = 0
+        self._snapshots = None
+        self._rotations = 0
+        self._stats = None
+        self._trace = None
+        if args:
+            items = mapping_items(args[0])
+            for k, v in items:
+                self[k] = v
         for k, v in kwargs.items():
             self[k] = v
 
+    @classmethod
+    def from_sorted(
+        cls,
+        items: Union[Mapping, Iterable[Tuple[Hashable, Any]]],
+        key: Optional[Callable[[Hashable], Any]] = None,
+    ) -> 'RBTree':
+        '''
+        Build a tree from ``(key, value)`` pairs already in tree order in O(n).
+
+        :param items: A mapping or an iterable of pairs sorted by key.
+        :param key: The key function of the tree.
+        :raises ValueError: If the keys are not sorted.
+        :return: A new tree.
+        '''
+        return cls.from_items(items, presorted=True, key=key)
+
+    @classmethod
+    def from_items(
+        cls,
+        items: Union[Mapping, Iterable[Tuple[Hashable, Any]]],
+        presorted: bool = False,
+        key: Optional[Callable[[Hashable], Any]] = None,
+    ) -> 'RBTree':
+        '''
+        Build a tree from ``(key, value)`` pairs.
+
+        The pairs are linked into a balanced tree directly instead of being
+        inserted one by one, which takes O(n) for sorted input and
+        O(n log n) (the cost of sorting) otherwise. As with ``dict``, the last
+        value wins for repeated keys.
+
+        :param items: A mapping or an iterable of pairs.
+        :param presorted: If true, the pairs are expected to be sorted by key.
+        :param key: The key function of the tree.
+        :raises ValueError: If ``presorted`` is true but the keys are not sorted.
+        :return: A new tree.
+        '''
+        items = mapping_items(items)
+        tree = cls(key)
+        get_sort_key = tree._get_sort_key
+        nodes = [RBTreeNode(k, v, left=NIL, right=NIL, sort_key=get_sort_key(k)) for k, v in items]
+        if not presorted:
+            nodes.sort(key=attrgetter('sort_key'))
+
+        unique = []
+        for node in nodes:
+            if unique and not unique[-1].sort_key < node.sort_key:
+                if node.sort_key < unique[-1].sort_key:
+                    raise ValueError(f'Keys are not sorted: {unique[-1].key!r} goes before {node.key!r}')
+                unique[-1].value = node.value
+            else:
+                unique.append(node)
+
+        tree._build(unique)
+        return tree
+
+    @classmethod
+    def load(cls, path: Union[str, os.PathLike], key: Optional[Callable[[Hashable], Any]] = None) -> 'RBTree':
+        '''
+        Read a tree written by :meth:`dump` and bulk build it in O(n).
+
+        .. warning::
+            Keys and values that are not all ints or all floats are unpickled, and
+            unpickling can run arbitrary code: never load a file from an untrusted
+            source.
+
+        :param path: The path of the file.
+        :param key: The key function of the dumped tree, which is not stored.
+        :raises ValueError: If the file is not in the format or the keys are
+            not sorted by ``key``.
+        :return: A new tree.
+        '''
+        keys, values = _rbtree_file.load(path)
+        return cls.from_sorted(zip(keys, values), key=key)
+
+    @classmethod
+    def join(cls, left: 'RBTree', right: 'RBTree') -> 'RBTree':
+        '''
+        Concatenate two trees whose key ranges do not overlap in O(log n).
+
+        The nodes are moved, not copied: both trees are left empty.
+
+        :param left: A tree whose keys are all less than the keys of ``right``.
+        :param right: A tree whose keys are all greater than the keys of ``left``.
+        :raises ValueError: If the trees overlap or have different key functions.
+        :return: A new tree with the keys of both trees.
+        '''
+        if left._key is not right._key:
+            raise ValueError('Cannot join trees with different key functions')
+        if left and right and not left._get_max_node().sort_key < right._get_min_node().sort_key:
+            raise ValueError('All keys of the left tree must be less than the keys of the right tree')
+        left._before_write()
+        right._before_write()
+
+        tree = cls(left._key)
+        tree._sized = left._sized and right._sized
+        length = len(left) + len(right)
+        if not right:
+            tree._root, tree._black_height = left._root, left._black_height
+        elif not left:
+            tree._root, tree._black_height = right._root, right._black_height
+        else:
+            mid = right._get_min_node()
+            del right[mid.key]
+            tree._join_nodes(left._root, left._black_height, mid, right._root, right._black_height)
+        tree._len = length
+        left.clear()
+        right.clear()
+        return tree
+
+    def __reduce__(self) -> Tuple[Callable[..., 'RBTree'], Tuple[List[Tuple[Hashable, Any]], Any], Dict[str, Any]]:
+        '''
+        Pickle the pairs in order instead of the linked nodes, and rebuild in O(n).
+
+        .. warning::
+            As with any pickle, unpickling a tree can run arbitrary code, so
+            never unpickle data from an untrusted source.
+        '''
+        items = [(node.key, node.value) for node in self._iter_nodes()]
+        return self.__class__.from_sorted, (items, self._key), {'indexed': self.indexed}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        if state['indexed']:
+            self.enable_index()
+
     def __getitem__(self, key: Hashable):
-        '''Get value by key.'''
+        '''Get value by key, or a list of keys by a slice of positions.'''
+        if isinstance(key, slice):
+            return self._get_slice(key)
+        if self._stats is not None and self._stats._sample():
+            return self._traced('find', key, self.__getitem__, key)
         node = self._get_node(key, True)
         return node.value
 
     def __setitem__(self, key: Hashable, value: Any) -> None:
         '''Insert a new node or rewrite existing.'''
-        node = self._get_node(key)
-
-        if node:
-            node.value = value
-            return
+        if self._stats is not None and self._stats._sample():
+            return self._traced('insert', key, self.__setitem__, key, value)
+        self._before_write()
+        sort_key = self._get_sort_key(key)
+        index = self._index
+        if index is not None:
+            node = index.get(sort_key)
+            if node is not None:
+                node.value = value
+                return
+
+        parent = None
+        node = self._root
+        while node:
+            parent = node
+            if sort_key < node.sort_key:
+                node = node.left
+            elif node.sort_key < sort_key:
+                node = node.right
+            else:
+                node.value = value
+                return
 
-        new_node = RBTreeNode(key, value, RBTreeColor.RED)
-        leaf = self._get_leaf(key)
-        new_node.parent = leaf
-        if not leaf:
-            self._root = new_node
-        elif new_node > leaf:
-            leaf.right = new_node
-        else:
-            leaf.left = new_node
-
-        self._fix_insert(new_node)
-        self._len += 1
+        self._attach(parent, key, value, sort_key)
 
     def __delitem__(self, key: Hashable):
         '''Delete node.'''
+        if self._stats is not None and self._stats._sample():
+            return self._traced('remove', key, self.__delitem__, key)
+        self._before_write()
         node_to_delete = self._get_node(key, raise_error=True)
 
         if node_to_delete.left and node_to_delete.right:
@@ -48,63 +238,644 @@ class RBTree:
             self._swap_kv(node_to_delete, fix_node)
             node_to_delete = fix_node
 
+        if self._index is not None:
+            del self._index[node_to_delete.sort_key]
+        if self._sized:
+            parent = node_to_delete.parent
+            while parent:
+                parent.size -= 1
+                parent = parent.parent
         self._delete(node_to_delete)
         self._len -= 1
+        self._version += 1
 
     def __len__(self):
         '''Get the number of nodes.'''
         return self._len
 
     def __str__(self):
-        string = f'{self.__class__.__name__}({{'
-        for k, v in self.items():
-            string += f'{repr(k)}: {repr(v)}, '
-        string = string[:-2]
-        string += '})'
-        return string
+        items = ', '.join(f'{repr(node.key)}: {repr(node.value)}' for node in self._iter_nodes())
+        return f'{self.__class__.__name__}({{{items}}})'
+
+    def __or__(self, other: Union['RBTree', Mapping]) -> 'RBTree':
+        return self.union(other)
+
+    def __and__(self, other: Union['RBTree', Mapping]) -> 'RBTree':
+        return self.intersection(other)
+
+    def __sub__(self, other: Union['RBTree', Mapping]) -> 'RBTree':
+        return self.difference(other)
+
+    def __xor__(self, other: Union['RBTree', Mapping]) -> 'RBTree':
+        return self.symmetric_difference(other)
 
     def __iter__(self):
-        return iter(self.keys())
+        for node in self._iter_nodes():
+            yield node.key
+
+    def __reversed__(self):
+        for node in self._iter_nodes(reverse=True):
+            yield node.key
+
+    def __contains__(self, key: Hashable) -> bool:
+        if self._stats is not None and self._stats._sample():
+            return self._traced('find', key, self.__contains__, key)
+        return self._get_node(key) is not None
 
     def __bool__(self):
         return len(self) != 0
 
+    @property
+    def key(self) -> Optional[Callable[[Hashable], Any]]:
+        '''Get the key function the tree is ordered by.'''
+        return self._key
+
     @property
     def height(self):
-        '''Get tree height.'''
+        '''Get tree height. Takes O(n); see :attr:`height_bounds` for O(1).'''
         return self._get_height()
 
+    @property
+    def black_height(self) -> int:
+        '''Get the number of black nodes on every path from the root down, in O(1).'''
+        return self._black_height
+
+    @property
+    def height_bounds(self) -> Tuple[int, int]:
+        '''
+        Get the lowest and the highest height the tree can have, in O(1).
+
+        Every path down has :attr:`black_height` black nodes and at most as
+        many red ones, and no tree of ``n`` nodes is lower than a complete one.
+        '''
+        n = self._len
+        return max(n.bit_length(), self._black_height), min(n, 2 * self._black_height)
+
+    @property
+    def rotations(self) -> int:
+        '''Get the number of rotations done by the rebalancing so far.'''
+        return self._rotations
+
+    @property
+    def stats(self) -> Optional[RBTreeStats]:
+        '''Get the counters started by :meth:`enable_stats`, None if disabled.'''
+        return self._stats
+
     def get(self, key: Hashable, default: Any = None) -> Union[RBTreeNode, Any]:
         try:
             return self[key]
         except KeyError:
             return default
 
-    def items(self):
-        for k in self.keys():
-            yield k, self[k]
+    def items(self) -> RBTreeItemsView:
+        return RBTreeItemsView(self)
+
+    def keys(self) -> RBTreeKeysView:
+        return RBTreeKeysView(self)
+
+    def values(self) -> RBTreeValuesView:
+        return RBTreeValuesView(self)
+
+    def min(self) -> Hashable:
+        '''
+        Get the smallest key.
+
+        :raises ValueError: If the tree is empty.
+        '''
+        if not self:
+            raise ValueError('min() of an empty tree')
+        return self._get_min_node().key
+
+    def max(self) -> Hashable:
+        '''
+        Get the largest key.
+
+        :raises ValueError: If the tree is empty.
+        '''
+        if not self:
+            raise ValueError('max() of an empty tree')
+        return self._get_max_node().key
+
+    def floor(self, key: Hashable) -> Optional[Hashable]:
+        '''Get the largest key less than or equal to the given one, or None.'''
+        node = self._find_le(self._get_sort_key(key), inclusive=True)
+        return node.key if node else None
+
+    def ceiling(self, key: Hashable) -> Optional[Hashable]:
+        '''Get the smallest key greater than or equal to the given one, or None.'''
+        node = self._find_ge(self._get_sort_key(key), inclusive=True)
+        return node.key if node else None
+
+    def lower(self, key: Hashable) -> Optional[Hashable]:
+        '''Get the largest key strictly less than the given one, or None.'''
+        node = self._find_le(self._get_sort_key(key), inclusive=False)
+        return node.key if node else None
+
+    def higher(self, key: Hashable) -> Optional[Hashable]:
+        '''Get the smallest key strictly greater than the given one, or None.'''
+        node = self._find_ge(self._get_sort_key(key), inclusive=False)
+        return node.key if node else None
+
+    def irange(
+        self,
+        lo: Optional[Hashable] = None,
+        hi: Optional[Hashable] = None,
+        inclusive: Tuple[bool, bool] = (True, True),
+        reverse: bool = False,
+    ) -> Iterator[Hashable]:
+        '''
+        Lazily iterate over the keys between ``lo`` and ``hi``.
+
+        Only the nodes on the way to the first key and the nodes in the range
+        are visited, so getting ``k`` keys costs O(log n + k).
+
+        :param lo: The lower bound, None for no bound.
+        :param hi: The upper bound, None for no bound.
+        :param inclusive: Whether the lower and the upper bounds are included.
+        :param reverse: If true, yield the keys in descending order.
+        '''
+        for node in self._irange_nodes(lo, hi, inclusive, reverse):
+            yield node.key
+
+    def cursor(self, key: Optional[Hashable] = None) -> RBTreeCursor:
+        '''
+        Get a cursor at the first key not less than ``key``.
+
+        :param key: The key to look for, None for the smallest key.
+        '''
+        if key is None:
+            return RBTreeCursor(self, self._get_min_node())
+        return RBTreeCursor(self, self._find_ge(self._get_sort_key(key), inclusive=True))
+
+    @property
+    def indexed(self) -> bool:
+        '''Whether the tree keeps a hash index of its nodes.'''
+        return self._index is not None
+
+    def enable_index(self) -> None:
+        '''
+        Start keeping a dict from sort keys to nodes next to the tree.
+
+        Point lookups, membership tests and updates of existing keys then take
+        O(1) instead of a descent, for roughly 30-40 extra bytes per entry. The
+        sort keys must be hashable, and their ``==`` must agree with their
+        ordering. Ordered operations keep using the tree. Building the index
+        takes O(n).
+        '''
+        if self._index is None:
+            self._index = dict((node.sort_key, node) for node in self._iter_nodes())
+
+    def disable_index(self) -> None:
+        '''Drop the hash index.'''
+        self._index = None
+
+    def enable_stats(self, sample_every: int = 1) -> RBTreeStats:
+        '''
+        Start counting the work done by inserts, removals and lookups.
+
+        One in every ``sample_every`` of them is measured: the comparisons and
+        the depth of its search, the rotations, recolorings and fix-up cases of
+        its rebalancing, and its time. While disabled, the counting costs one
+        attribute check per operation, and the unsampled operations add a
+        countdown to that.
+
+        :return: The counters, kept until :meth:`disable_stats`. Enabling
+            again changes the sampling of the same counters.
+        '''
+        if self._stats is None:
+            self._stats = RBTreeStats(sample_every)
+        elif sample_every < 1:
+            raise ValueError(f'sample_every must be positive, got {sample_every}')
+        else:
+            self._stats.sample_every = sample_every
+        return self._stats
+
+    def disable_stats(self) -> None:
+        '''Stop counting and drop the counters.'''
+        self._stats = None
+
+    def enable_order_statistics(self) -> None:
+        '''
+        Start maintaining subtree sizes for rank, select and slicing.
+
+        Computing the sizes takes O(n) once, after which inserts and deletes
+        keep them up to date in O(log n). The positional methods call this
+        themselves on first use.
+        '''
+        if self._sized:
+            return
+        for node in self._traverse_postorder(self._root):
+            node.size = node.left.size + node.right.size + 1
+        self._sized = True
+
+    def rank(self, key: Hashable) -> int:
+        '''Get the number of keys less than the given one in O(log n).'''
+        self.enable_order_statistics()
+        sort_key = self._get_sort_key(key)
+        rank = 0
+        node = self._root
+        while node:
+            if node.sort_key < sort_key:
+                rank += node.left.size + 1
+                node = node.right
+            else:
+                node = node.left
+        return rank
+
+    def select(self, index: int) -> Hashable:
+        '''
+        Get the key at the given position in sorted order in O(log n).
 
-    def keys(self):
-        return tuple(node.key for node in self._traverse_inorder(self._root))
+        :param index: The position of the key, negative positions count from the end.
+        :raises IndexError: If the position is out of range.
+        '''
+        return self._select_node(index).key
+
+    def percentile(self, p: float) -> Hashable:
+        '''
+        Get the key at the ``p``-th percentile (nearest-rank method) in O(log n).
+
+        :param p: The percentile from 0 to 100.
+        :raises ValueError: If the tree is empty or ``p`` is out of range.
+        '''
+        if not 0 <= p <= 100:
+            raise ValueError(f'percentile must be between 0 and 100, got {p!r}')
+        if not self:
+            raise ValueError('percentile() of an empty tree')
+        return self.select(max(0, ceil(p * len(self) / 100) - 1))
+
+    def remove_range(
+        self,
+        lo: Optional[Hashable] = None,
+        hi: Optional[Hashable] = None,
+        inclusive: Tuple[bool, bool] = (True, True),
+    ) -> int:
+        '''
+        Remove all keys between ``lo`` and ``hi``.
+
+        The bounds work as in :meth:`irange`.
+
+        :return: The number of removed keys.
+        '''
+        nodes = list(self._irange_nodes(lo, hi, inclusive, False))
+        self._remove_nodes(nodes)
+        return len(nodes)
+
+    def pop_range(
+        self,
+        lo: Optional[Hashable] = None,
+        hi: Optional[Hashable] = None,
+        inclusive: Tuple[bool, bool] = (True, True),
+    ) -> List[Tuple[Hashable, Any]]:
+        '''
+        Remove all keys between ``lo`` and ``hi`` and return the removed pairs.
+
+        The bounds work as in :meth:`irange`.
+
+        :return: The removed ``(key, value)`` pairs in sorted order.
+        '''
+        nodes = list(self._irange_nodes(lo, hi, inclusive, False))
+        items = [(node.key, node.value) for node in nodes]
+        self._remove_nodes(nodes)
+        return items
+
+    def delete_many(self, keys: Iterable[Hashable]) -> int:
+        '''
+        Remove the given keys, skipping the ones not in the tree.
+
+        :return: The number of removed keys.
+        '''
+        nodes = dict((id(node), node) for node in self._find_nodes(keys) if node is not None)
+        self._remove_nodes(list(nodes.values()))
+        return len(nodes)
+
+    def insert_many(self, keys: Iterable[Hashable], values: Iterable[Any]) -> None:
+        '''
+        Insert or rewrite a batch of keys.
 
-    def values(self):
-        return tuple(node.value for node in self._traverse_inorder(self._root))
+        The batch is sorted and each key is searched for from the position of
+        the previous one, which costs O(log d) for keys at distance ``d``
+        instead of a full descent. A batch that is large compared to the tree
+        is merged with it and bulk built in O(n + m) instead.
+
+        :param keys: An iterable or a NumPy array of keys.
+        :param values: An iterable or a NumPy array of values, one per key.
+        :raises ValueError: If the number of keys and values differ.
+        '''
+        keys, values = self._as_list(keys), self._as_list(values)
+        if len(keys) != len(values):
+            raise ValueError(f'Got {len(keys)} keys but {len(values)} values')
+        self._before_write()
+        get_sort_key = self._get_sort_key
+        batch = sorted(
+            ((get_sort_key(k), k, v) for k, v in zip(keys, values)),
+            key=itemgetter(0),
+        )
+        if not batch:
+            return
+
+        if len(batch) * len(self).bit_length() >= 4 * len(self):
+            self._merge_batch(batch)
+            return
+
+        finger = None
+        for sort_key, key, value in batch:
+            node, parent = self._finger_search(finger, sort_key)
+            if node:
+                node.value = value
+                finger = node
+            else:
+                finger = self._attach(parent, key, value, sort_key)
+
+    def find_many(self, keys: Iterable[Hashable], default: Any = None) -> Union[List[Any], Any]:
+        '''
+        Get the values of a batch of keys.
+
+        The batch is searched for in sorted order, each key starting from the
+        position of the previous one, as in :meth:`insert_many`.
+
+        :param keys: An iterable or a NumPy array of keys.
+        :param default: The value for the keys not in the tree.
+        :return: The values in the order of ``keys``, as a NumPy array if
+            ``keys`` is one, else as a list.
+        '''
+        values = [default if node is None else node.value for node in self._find_nodes(keys)]
+        if type(keys).__module__ == 'numpy':
+            import numpy
+
+            return numpy.asarray(values)
+        return values
+
+    def remove_many(self, keys: Iterable[Hashable]) -> None:
+        '''
+        Remove a batch of keys.
+
+        Nothing is removed if any of the keys is missing.
+
+        :param keys: An iterable or a NumPy array of keys.
+        :raises KeyError: If a key is not in the tree.
+        '''
+        keys = self._as_list(keys)
+        nodes = {}
+        for key, node in zip(keys, self._find_nodes(keys)):
+            if node is None:
+                raise KeyError(key)
+            nodes[id(node)] = node
+        self._remove_nodes(list(nodes.values()))
+
+    def union(
+        self,
+        other: Union['RBTree', Mapping],
+        merge: Optional[Callable[[Any, Any], Any]] = None,
+    ) -> 'RBTree':
+        '''
+        Get a new tree with the keys of both trees in O(n + m).
+
+        :param other: A tree with the same key function, or a mapping.
+        :param merge: Called as ``merge(value, other_value)`` for the keys in
+            both trees to get the resulting value. By default the value from
+            ``other`` wins, as in ``dict.update``.
+        '''
+        return self._merge(other, merge, True, True, True)
+
+    def intersection(
+        self,
+        other: Union['RBTree', Mapping],
+        merge: Optional[Callable[[Any, Any], Any]] = None,
+    ) -> 'RBTree':
+        '''
+        Get a new tree with the keys present in both trees in O(n + m).
+
+        :param other: A tree with the same key function, or a mapping.
+        :param merge: Called as ``merge(value, other_value)`` to get the
+            resulting value. By default the value from ``other`` wins.
+        '''
+        return self._merge(other, merge, False, True, False)
+
+    def difference(self, other: Union['RBTree', Mapping]) -> 'RBTree':
+        '''Get a new tree with the keys not present in ``other`` in O(n + m).'''
+        return self._merge(other, None, True, False, False)
+
+    def symmetric_difference(self, other: Union['RBTree', Mapping]) -> 'RBTree':
+        '''Get a new tree with the keys present in exactly one of the trees in O(n + m).'''
+        return self._merge(other, None, True, False, True)
+
+    def split(self, key: Hashable) -> Tuple['RBTree', 'RBTree']:
+        '''
+        Cut the tree at a key in O(log n).
+
+        The nodes are moved, not copied: the tree is left empty. Subtree sizes
+        are needed to know the lengths of the parts, so the first split of a
+        tree also enables order statistics.
+
+        :param key: The key to split at.
+        :return: A tree with the keys less than ``key`` and a tree with the rest.
+        '''
+        self._before_write()
+        self.enable_order_statistics()
+        sort_key = self._get_sort_key(key)
+        parts = self._split_node(self._root, self._black_height, sort_key)
+        left_root, left_height, right_root, right_height = parts
+
+        trees = []
+        for root, height in ((left_root, left_height), (right_root, right_height)):
+            tree = self.__class__(self._key)
+            tree._root = root
+            tree._black_height = height
+            tree._len = root.size
+            tree._sized = True
+            trees.append(tree)
+        self.clear()
+        return trees[0], trees[1]
+
+    def copy(self) -> 'RBTree':
+        '''Get a shallow copy of the tree in O(n).'''
+        tree = self.__class__(self._key)
+        tree._sized = self._sized
+        if self._index is not None:
+            tree._index = {}
+        tree._build([
+            RBTreeNode(node.key, node.value, left=NIL, right=NIL, sort_key=node.sort_key)
+            for node in self._iter_nodes()
+        ])
+        return tree
+
+    def dump(self, path: Union[str, os.PathLike]) -> None:
+        '''
+        Write the pairs to a binary file in O(n).
+
+        The keys and the values are stored in tree order, each as an int64 or
+        float64 array when all of them fit and as pickles otherwise. The file
+        is read back by :meth:`load` or searched in place by
+        :class:`MappedRBTree`.
+
+        .. warning::
+            Reading the file back may unpickle its keys and values, which can
+            run arbitrary code, so only load files from trusted sources.
+
+        :param path: The path of the file.
+        '''
+        keys, values = [], []
+        for node in self._iter_nodes():
+            keys.append(node.key)
+            values.append(node.value)
+        _rbtree_file.dump(path, keys, values)
+
+    def snapshot(self) -> PersistentRBTree:
+        '''
+        Get a read-only copy of the tree in O(1).
+
+        The snapshot reads the nodes of the tree until the tree is about to
+        change. Then the nodes are copied once, in O(n), for all the snapshots
+        taken since the last change, so snapshots of a tree that does not
+        change while they are alive cost nothing. Updating the snapshot gives
+        new trees that share its nodes, as with any :class:`PersistentRBTree`.
+        '''
+        snapshot = PersistentRBTree(self._key)
+        snapshot._root = self._root or None
+        snapshot._len = self._len
+        snapshot._source = self
+        if self._snapshots is None:
+            self._snapshots = WeakSet()
+        self._snapshots.add(snapshot)
+        return snapshot
+
+    def validate(self) -> None:
+        '''
+        Check the red-black properties and the bookkeeping of the tree.
+
+        One iterative in-order pass over the nodes, so it takes O(n) and does
+        not depend on the recursion limit. Checks that the root is black, no
+        red node has a red child, every path down has :attr:`black_height`
+        black nodes, the parent links match the child links, the keys are in
+        strictly ascending order, and the length, the subtree sizes and the
+        index agree with the nodes.
+
+        :raises RuntimeError: On the first violation found.
+        '''
+        root = self._root
+        if root and (root.red or root.parent is not None):
+            raise RuntimeError(f'The root {root!r} must be black and have no parent')
+        expected_blacks = self._black_height
+        sized = self._sized
+        index = self._index
+        count = 0
+        prev = None
+        stack = []
+        node, blacks = root, 0
+        while True:
+            while node:
+                blacks += not node.red
+                for child in (node.left, node.right):
+                    if child:
+                        if child.parent is not node:
+                            raise RuntimeError(f'{child!r} is a child of {node!r} but has parent {child.parent!r}')
+                        if node.red and child.red:
+                            raise RuntimeError(f'The red node {node!r} has the red child {child!r}')
+                    elif blacks != expected_blacks:
+                        raise RuntimeError(
+                            f'The path down to {node!r} has {blacks} black nodes, expected {expected_blacks}'
+                        )
+                if sized and node.size != node.left.size + node.right.size + 1:
+                    raise RuntimeError(f'{node!r} has size {node.size}, expected {node.left.size + node.right.size + 1}')
+                stack.append((node, blacks))
+                node = node.left
+            if not stack:
+                break
+            node, blacks = stack.pop()
+            if prev is not None and not prev.sort_key < node.sort_key:
+                raise RuntimeError(f'{node!r} is after {prev!r} but its key is not greater')
+            if index is not None and index.get(node.sort_key) is not node:
+                raise RuntimeError(f'The index does not map {node.key!r} to {node!r}')
+            count += 1
+            prev = node
+            node = node.right
+
+        if count != self._len:
+            raise RuntimeError(f'The tree has {count} nodes but a length of {self._len}')
+        if index is not None and len(index) != count:
+            raise RuntimeError(f'The index has {len(index)} entries for {count} nodes')
+
+    def print_tree(self, hash_key: bool = False, max_depth: Optional[int] = None, max_nodes: Optional[int] = None):
+        self.write_tree(sys.stdout, hash_key, max_depth, max_nodes)
+
+    def write_tree(
+        self,
+        fileobj: TextIO,
+        hash_key: bool = False,
+        max_depth: Optional[int] = None,
+        max_nodes: Optional[int] = None,
+    ) -> None:
+        '''
+        Write the tree drawing of :meth:`print_tree` to a file line by line.
+
+        :param fileobj: A text file to write to.
+        :param hash_key: If true, show the hashes of the keys instead of the keys.
+        :param max_depth: Draw only the nodes at most this deep (the root is
+            at depth 0), None for no limit.
+        :param max_nodes: Draw only this many nodes, None for no limit.
+        '''
+        for line in self._iter_tree_lines(hash_key, max_depth, max_nodes):
+            fileobj.write(line)
+
+    def iter_dot_lines(self, max_depth: Optional[int] = None) -> Iterator[str]:
+        '''
+        Lazily generate the lines of :meth:`get_dot_string`.
+
+        :param max_depth: Describe only the edges from the nodes at most this
+            deep (the root is at depth 0), None for no limit.
+        '''
+        yield 'graph {\n'
+        stack = []
+        node, depth = self._root, 0
+        while True:
+            while node and (max_depth is None or depth <= max_depth):
+                stack.append((node, depth))
+                node, depth = node.left, depth + 1
+            if not stack:
+                break
+            node, depth = stack.pop()
+            yield from node.get_graphviz().splitlines(keepends=True)
+            node, depth = node.right, depth + 1
+        yield '}'
+
+    def write_dot(self, fileobj: TextIO, max_depth: Optional[int] = None) -> None:
+        '''Write :meth:`get_dot_string` to a file line by line.'''
+        fileobj.writelines(self.iter_dot_lines(max_depth))
 
-    def print_tree(self, hash_key: bool = False):
-        self._print_tree(self._root, '', right=False, root=True, hash_key=hash_key)
-    
     def get_dot_string(self) -> str:
-        graphviz_string = 'graph {\n'
-        for k in self.keys():
-            node = self._get_node(k, True)
-            graphviz_string += node.get_graphviz()
-        graphviz_string += '}'
-        return graphviz_string
+        return ''.join(self.iter_dot_lines())
 
     # Task methods (start)
 
-    def insert(self, key: Hashable, value: Any):
-        self[key] = value
+    def insert(
+        self,
+        key: Hashable,
+        value: Any,
+        hint: Optional[Union[RBTreeNode, RBTreeCursor]] = None,
+    ) -> RBTreeNode:
+        '''
+        Insert a new node or rewrite existing.
+
+        With a hint the search starts from it instead of from the root, which
+        costs O(log d) for a key at distance ``d`` from the hint. A node hint
+        is first checked to be in the tree, in O(log n); a node that is not,
+        such as one removed or moved to another tree, is ignored.
+
+        :param hint: A cursor of the tree, or a node of the tree such as the
+            one returned by a previous insert.
+        :raises ValueError: If the hint is a cursor of another tree.
+        :return: The node with the key.
+        '''
+        if self._stats is not None and self._stats._sample():
+            return self._traced('insert', key, self.insert, key, value, hint)
+        if isinstance(hint, RBTreeCursor):
+            if hint._tree is not self:
+                raise ValueError('The cursor belongs to another tree')
+            hint = hint._get_node() or None
+        elif hint is not None and not self._contains_node(hint):
+            hint = None
+        return self._insert_near(hint, key, value)
 
     def remove(self, key: Hashable):
         del self[key]
@@ -113,14 +884,19 @@ class RBTree:
         return self[key]
 
     def clear(self):
-        while self:
-            del self[self._root.key]
+        self._before_write()
+        self._root = NIL
+        self._len = 0
+        self._black_height = 0
+        if self._index is not None:
+            self._index = {}
+        self._version += 1
 
     def get_keys(self):
-        return self.keys()
+        return tuple(self.keys())
 
     def get_values(self):
-        return self.values()
+        return tuple(self.values())
 
     def print(self):
         print(self)
@@ -139,164 +915,915 @@ class RBTree:
             node = node.left
         return node
 
-    def _get_height(self, node: RBTreeNode = None, h: int = 0) -> int:
-        if not self._root:
-            return 0
-        if not isinstance(node, RBTreeNode):
-            node = self._root
+    def _select_node(self, index: int) -> RBTreeNode:
+        self.enable_order_statistics()
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('tree index out of range')
+        node = self._root
+        while True:
+            left_size = node.left.size
+            if index < left_size:
+                node = node.left
+            elif index > left_size:
+                index -= left_size + 1
+                node = node.right
+            else:
+                return node
+
+    def _get_slice(self, positions: slice) -> List[Hashable]:
+        start, stop, step = positions.indices(len(self))
+        if step != 1:
+            return [self.select(i) for i in range(start, stop, step)]
+        keys = []
+        if start < stop:
+            node = self._select_node(start)
+            for _ in range(stop - start):
+                keys.append(node.key)
+                node = self._successor(node)
+        return keys
+
+    def _contains_node(self, node: RBTreeNode) -> bool:
+        '''
+        Whether a node is in the tree.
 
+        Walks up to the root checking that each node is a child of its parent:
+        a removed node is no child of its old parent, and the parents of a node
+        dropped by :meth:`clear` or moved to another tree lead to another root.
+        '''
         if not node:
-            return h
+            return False
+        parent = node.parent
+        while parent is not None:
+            if node is not parent.left and node is not parent.right:
+                return False
+            node, parent = parent, parent.parent
+        return node is self._root
+
+    def _successor(self, node: RBTreeNode) -> RBTreeNode:
+        if node.right:
+            return self._get_min_node(node.right)
+        while node.parent and node is node.parent.right:
+            node = node.parent
+        return node.parent or NIL
+
+    def _predecessor(self, node: RBTreeNode) -> RBTreeNode:
+        if node.left:
+            return self._get_max_node(node.left)
+        while node.parent and node is node.parent.left:
+            node = node.parent
+        return node.parent or NIL
+
+    def _find_le(self, sort_key: Any, inclusive: bool) -> RBTreeNode:
+        '''Get the last node before ``sort_key`` (or at it, if inclusive), else NIL.'''
+        found = NIL
+        node = self._root
+        while node:
+            if node.sort_key < sort_key or (inclusive and not sort_key < node.sort_key):
+                found = node
+                node = node.right
+            else:
+                node = node.left
+        return found
+
+    def _find_ge(self, sort_key: Any, inclusive: bool) -> RBTreeNode:
+        '''Get the first node after ``sort_key`` (or at it, if inclusive), else NIL.'''
+        found = NIL
+        node = self._root
+        while node:
+            if sort_key < node.sort_key or (inclusive and not node.sort_key < sort_key):
+                found = node
+                node = node.left
+            else:
+                node = node.right
+        return found
+
+    def _irange_nodes(
+        self,
+        lo: Optional[Hashable],
+        hi: Optional[Hashable],
+        inclusive: Tuple[bool, bool],
+        reverse: bool,
+    ) -> Iterator[RBTreeNode]:
+        lo_key = None if lo is None else self._get_sort_key(lo)
+        hi_key = None if hi is None else self._get_sort_key(hi)
+        lo_inclusive, hi_inclusive = inclusive
+
+        version = self._version
+        if reverse:
+            node = self._get_max_node() if hi is None else self._find_le(hi_key, hi_inclusive)
+            while node and (
+                lo is None
+                or lo_key < node.sort_key
+                or (lo_inclusive and not node.sort_key < lo_key)
+            ):
+                yield node
+                self._check_version(version)
+                node = self._predecessor(node)
         else:
-            h += 1
+            node = self._get_min_node() if lo is None else self._find_ge(lo_key, lo_inclusive)
+            while node and (
+                hi is None
+                or node.sort_key < hi_key
+                or (hi_inclusive and not hi_key < node.sort_key)
+            ):
+                yield node
+                self._check_version(version)
+                node = self._successor(node)
 
-        return max(self._get_height(node.left, h), self._get_height(node.right, h))
+    def _iter_nodes(self, reverse: bool = False) -> Iterator[RBTreeNode]:
+        '''
+        Iterate over the nodes in order, following parent pointers.
 
-    def _fix_insert(self, node: RBTreeNode):
-        self._insert_case_1(node)
+        Each step takes O(1) amortized time and no recursion.
 
-    def _insert_case_1(self, node: RBTreeNode) -> None:
-        if not node.parent:
-            node.color_black()
+        :raises RuntimeError: If the tree changes size during iteration.
+        '''
+        version = self._version
+        if reverse:
+            node = self._get_max_node()
+            while node:
+                yield node
+                self._check_version(version)
+                if node.left:
+                    node = node.left
+                    while node.right:
+                        node = node.right
+                else:
+                    parent = node.parent
+                    while parent and node is parent.left:
+                        node, parent = parent, parent.parent
+                    node = parent
         else:
-            self._insert_case_2(node)
-
-    def _insert_case_2(self, node: RBTreeNode) -> None:
-        if node.parent.is_black():
+            node = self._get_min_node()
+            while node:
+                yield node
+                self._check_version(version)
+                if node.right:
+                    node = node.right
+                    while node.left:
+                        node = node.left
+                else:
+                    parent = node.parent
+                    while parent and node is parent.right:
+                        node, parent = parent, parent.parent
+                    node = parent
+
+    def _before_write(self) -> None:
+        if self._snapshots:
+            self._detach_snapshots()
+
+    def _detach_snapshots(self) -> None:
+        '''Give the snapshots reading the nodes of the tree a copy of them.'''
+        snapshots, self._snapshots = list(self._snapshots or ()), None
+        if not snapshots:
             return
+        root = PersistentRBTree._from_nodes(self._iter_nodes(), self._len, self._key)._root
+        for snapshot in snapshots:
+            snapshot._root = root
+            snapshot._source = None
+
+    def _check_version(self, version: int) -> None:
+        if version != self._version:
+            raise RuntimeError(f'{self.__class__.__name__} changed size during iteration')
+
+    def _get_height(self) -> int:
+        '''Count the levels of the tree one by one.'''
+        height = 0
+        level = [self._root] if self._root else []
+        while level:
+            height += 1
+            level = [child for node in level for child in (node.left, node.right) if child]
+        return height
+
+    def _traced(self, operation: str, key: Hashable, method: Callable, *args: Any) -> Any:
+        '''
+        Run a sampled operation and record its counters.
+
+        The search of the key is measured before the operation. The operation
+        itself runs with the stats detached, so it takes the usual path, while
+        the fix-ups log their cases to ``_trace``. An operation that raises is
+        only counted in ``failures``.
+        '''
+        stats = self._stats
+        depth, comparisons = self._trace_search(self._get_sort_key(key))
+        rotations = self._rotations
+        self._trace = cases = []
+        self._stats = None
+        start = perf_counter()
+        try:
+            result = method(*args)
+        except BaseException:
+            stats.failures[operation] += 1
+            raise
+        finally:
+            seconds = perf_counter() - start
+            self._stats = stats
+            self._trace = None
+        stats._record(operation, depth, comparisons, self._rotations - rotations, cases, seconds)
+        return result
+
+    def _trace_search(self, sort_key: Any) -> Tuple[int, int]:
+        '''Get the number of nodes and of comparisons on the search path of a key.'''
+        depth = comparisons = 0
+        node = self._root
+        while node:
+            depth += 1
+            comparisons += 1
+            if sort_key < node.sort_key:
+                node = node.left
+                continue
+            comparisons += 1
+            if node.sort_key < sort_key:
+                node = node.right
+            else:
+                break
+        return depth, comparisons
+
+    def _attach(self, parent: Optional[RBTreeNode], key: Hashable, value: Any, sort_key: Any) -> RBTreeNode:
+        '''
+        Hang a new node under a parent found by a descent and rebalance.
+
+        :param parent: The last node on the search path, None for an empty tree.
+        :return: The new node.
+        '''
+        new_node = RBTreeNode(key, value, RBTreeColor.RED, parent, NIL, NIL, sort_key)
+        if parent is None:
+            self._root = new_node
+        elif sort_key < parent.sort_key:
+            parent.left = new_node
         else:
-            self._insert_case_3(node)
-
-    def _insert_case_3(self, node: RBTreeNode) -> None:
-        u = node.uncle
-        if u and u.is_red():
-            node.parent.color_black()
-            u.color_black()
-            g = node.gparent
-            g.color_red()
-            self._insert_case_1(g)
+            parent.right = new_node
+
+        if self._index is not None:
+            self._index[sort_key] = new_node
+        if self._sized:
+            while parent:
+                parent.size += 1
+                parent = parent.parent
+        self._fix_insert(new_node)
+        self._len += 1
+        self._version += 1
+        return new_node
+
+    def _insert_near(self, finger: Optional[RBTreeNode], key: Hashable, value: Any) -> RBTreeNode:
+        '''
+        Insert a new node or rewrite existing, searching from a node of the tree.
+
+        :param finger: A node to start from, None to start from the root.
+        :return: The node with the key.
+        '''
+        self._before_write()
+        sort_key = self._get_sort_key(key)
+        node, parent = self._finger_search(finger, sort_key)
+        if node:
+            node.value = value
+            return node
+        return self._attach(parent, key, value, sort_key)
+
+    @staticmethod
+    def _as_list(items: Iterable[Any]) -> List[Any]:
+        '''Get a list of Python objects out of an iterable or an array.'''
+        if hasattr(items, 'tolist'):
+            return items.tolist()
+        return list(items)
+
+    def _finger_search(
+        self,
+        finger: Optional[RBTreeNode],
+        sort_key: Any,
+    ) -> Tuple[RBTreeNode, Optional[RBTreeNode]]:
+        '''
+        Search for a sort key starting from a node of the tree.
+
+        The search climbs from ``finger`` to the lowest ancestor whose subtree
+        must hold the key and descends from there, so it visits O(log d)
+        nodes, where ``d`` is the distance between the keys.
+
+        :param finger: A node to start from, None to start from the root.
+        :param sort_key: The sort key to look for.
+        :return: The node with the key (NIL if absent) and the last node
+            visited, which is where a new node with the key belongs.
+        '''
+        node = finger
+        if node is None:
+            node = self._root
+        elif node.sort_key < sort_key:
+            parent = node.parent
+            while parent is not None and not (node is parent.left and sort_key < parent.sort_key):
+                node, parent = parent, parent.parent
+        elif sort_key < node.sort_key:
+            parent = node.parent
+            while parent is not None and not (node is parent.right and parent.sort_key < sort_key):
+                node, parent = parent, parent.parent
         else:
-            self._insert_case_4(node)
+            return node, node.parent
+
+        parent = None
+        while node:
+            if sort_key < node.sort_key:
+                parent, node = node, node.left
+            elif node.sort_key < sort_key:
+                parent, node = node, node.right
+            else:
+                return node, parent
+        return node, parent
+
+    def _find_nodes(self, keys: Iterable[Hashable]) -> List[Optional[RBTreeNode]]:
+        '''Get the nodes of a batch of keys in input order, None for the missing ones.'''
+        get_sort_key = self._get_sort_key
+        sort_keys = [get_sort_key(k) for k in self._as_list(keys)]
+        nodes = [None] * len(sort_keys)
+        if self._index is not None:
+            get = self._index.get
+            for i, sort_key in enumerate(sort_keys):
+                nodes[i] = get(sort_key)
+            return nodes
+
+        finger = None
+        for i in sorted(range(len(sort_keys)), key=sort_keys.__getitem__):
+            node, parent = self._finger_search(finger, sort_keys[i])
+            if node:
+                nodes[i] = finger = node
+            else:
+                finger = parent
+        return nodes
 
-    def _insert_case_4(self, node: RBTreeNode) -> None:
-        if node.is_right() and node.parent.is_left():
-            self._left_rotate(node.parent)
-            node = node.left
-        elif node.is_left() and node.parent.is_right():
-            self._right_rotate(node.parent)
-            node = node.right
-        self._insert_case_5(node)
-
-    def _insert_case_5(self, node: RBTreeNode) -> None:
-        g = node.gparent
-        node.parent.color_black()
-        g.color_red()
-        if node.is_left() and node.parent.is_left():
-            self._right_rotate(g)
+    def _merge_batch(self, batch: List[Tuple[Any, Hashable, Any]]) -> None:
+        '''
+        Merge sorted ``(sort_key, key, value)`` triples into the tree and rebuild it.
+
+        Existing nodes are reused; the last triple wins for repeated keys.
+        '''
+        merged = []
+        nodes = self._iter_nodes()
+        node = next(nodes, None)
+        for sort_key, key, value in batch:
+            while node is not None and node.sort_key < sort_key:
+                merged.append(node)
+                node = next(nodes, None)
+            if merged and not merged[-1].sort_key < sort_key:
+                merged[-1].value = value
+            elif node is not None and not sort_key < node.sort_key:
+                node.value = value
+                merged.append(node)
+                node = next(nodes, None)
+            else:
+                merged.append(RBTreeNode(key, value, left=NIL, right=NIL, sort_key=sort_key))
+        while node is not None:
+            merged.append(node)
+            node = next(nodes, None)
+        self._build(merged)
+        self._version += 1
+
+    def _remove_nodes(self, nodes: List[RBTreeNode]) -> None:
+        '''
+        Remove distinct nodes of the tree.
+
+        A few nodes are deleted one by one in O(k log n). When that would cost
+        more than relinking the rest of the tree, the remaining nodes are
+        rebuilt into a new balanced tree in a single O(n) pass instead (a
+        rebuild step is about four times cheaper than a delete step).
+        '''
+        if not nodes:
+            return
+        self._before_write()
+        if len(nodes) * len(self).bit_length() < 4 * len(self):
+            for key in [node.key for node in nodes]:
+                del self[key]
+            return
+
+        removed = set(map(id, nodes))
+        survivors = [node for node in self._iter_nodes() if id(node) not in removed]
+        self._build(survivors)
+        self._version += 1
+
+    def _build(self, nodes: List[RBTreeNode]) -> None:
+        '''
+        Replace the tree with sorted nodes linked into a balanced red-black tree.
+
+        Every node gets the middle of its range as the subtree root, so all
+        leaves end up on the last two levels. The nodes of the last level are
+        colored red unless it is full, which keeps the black height equal on
+        every path.
+
+        :param nodes: Detached nodes in tree order.
+        '''
+        n = len(nodes)
+        red_depth = n.bit_length() - 1 if (n + 1) & n else -1
+
+        def link(lo: int, hi: int, depth: int, parent: Optional[RBTreeNode]) -> RBTreeNode:
+            if lo >= hi:
+                return NIL
+            mid = (lo + hi) // 2
+            node = nodes[mid]
+            node.parent = parent
+            node.red = depth == red_depth
+            node.left = link(lo, mid, depth + 1, node)
+            node.right = link(mid + 1, hi, depth + 1, node)
+            node.size = hi - lo
+            return node
+
+        self._root = link(0, n, 0, None)
+        self._len = n
+        self._black_height = n.bit_length() - (red_depth >= 0)
+        if self._index is not None:
+            self._index = dict((node.sort_key, node) for node in nodes)
+
+    def _merge(
+        self,
+        other: Union['RBTree', Mapping],
+        merge: Optional[Callable[[Any, Any], Any]],
+        keep_left: bool,
+        keep_both: bool,
+        keep_right: bool,
+    ) -> 'RBTree':
+        '''
+        Walk both trees in order at once and bulk build the selected keys.
+
+        :param keep_left: Keep the keys present only in this tree.
+        :param keep_both: Keep the keys present in both trees.
+        :param keep_right: Keep the keys present only in ``other``.
+        '''
+        if not isinstance(other, RBTree):
+            other = self.from_items(other, key=self._key)
+        elif other._key is not self._key:
+            raise ValueError('Cannot combine trees with different key functions')
+
+        nodes = []
+
+        def keep(node: RBTreeNode, value: Any) -> None:
+            nodes.append(RBTreeNode(node.key, value, left=NIL, right=NIL, sort_key=node.sort_key))
+
+        left, right = self._iter_nodes(), other._iter_nodes()
+        a, b = next(left, None), next(right, None)
+        while a is not None and b is not None:
+            if a.sort_key < b.sort_key:
+                if keep_left:
+                    keep(a, a.value)
+                a = next(left, None)
+            elif b.sort_key < a.sort_key:
+                if keep_right:
+                    keep(b, b.value)
+                b = next(right, None)
+            else:
+                if keep_both:
+                    keep(b, b.value if merge is None else merge(a.value, b.value))
+                a, b = next(left, None), next(right, None)
+        if keep_left:
+            while a is not None:
+                keep(a, a.value)
+                a = next(left, None)
+        if keep_right:
+            while b is not None:
+                keep(b, b.value)
+                b = next(right, None)
+
+        tree = self.__class__(self._key)
+        tree._build(nodes)
+        return tree
+
+    def _join_nodes(
+        self,
+        left: RBTreeNode,
+        left_height: int,
+        mid: RBTreeNode,
+        right: RBTreeNode,
+        right_height: int,
+    ) -> None:
+        '''
+        Replace the tree with ``left`` + ``mid`` + ``right``.
+
+        ``mid`` is hung on the spine of the taller tree at the black node
+        whose black height matches the shorter tree, colored red and fixed up
+        as an insert, so the cost is O(|left_height - right_height| + 1).
+
+        :param left: The root of a tree with keys less than ``mid``.
+        :param left_height: The black height of ``left``.
+        :param mid: A detached node.
+        :param right: The root of a tree with keys greater than ``mid``.
+        :param right_height: The black height of ``right``.
+        '''
+        if left:
+            left.parent = None
+            if left.is_red():
+                left.color_black()
+                left_height += 1
+        if right:
+            right.parent = None
+            if right.is_red():
+                right.color_black()
+                right_height += 1
+
+        if left_height == right_height:
+            mid.parent = None
+            mid.left, mid.right = left, right
+            for child in (left, right):
+                if child:
+                    child.parent = mid
+            mid.color_black()
+            mid.size = left.size + right.size + 1
+            self._root = mid
+            self._black_height = left_height + 1
+            return
+
+        if left_height > right_height:
+            self._root, self._black_height = left, left_height
+            node, height = left, left_height
+            parent = None
+            while node.is_red() or height != right_height:
+                height -= node.is_black()
+                parent, node = node, node.right
+            parent.right = mid
+            mid.left, mid.right = node, right
+            attached = right
         else:
-            self._left_rotate(g)
+            self._root, self._black_height = right, right_height
+            node, height = right, right_height
+            parent = None
+            while node.is_red() or height != left_height:
+                height -= node.is_black()
+                parent, node = node, node.left
+            parent.left = mid
+            mid.left, mid.right = left, node
+            attached = left
+
+        mid.parent = parent
+        for child in (mid.left, mid.right):
+            if child:
+                child.parent = mid
+        mid.color_red()
+        mid.size = mid.left.size + mid.right.size + 1
+        if self._sized:
+            while parent:
+                parent.size += attached.size + 1
+                parent = parent.parent
+        self._fix_insert(mid)
+
+    def _split_node(
+        self,
+        node: RBTreeNode,
+        height: int,
+        sort_key: Any,
+    ) -> Tuple[RBTreeNode, int, RBTreeNode, int]:
+        '''
+        Split a subtree into nodes before ``sort_key`` and the rest.
+
+        :param node: The root of the subtree.
+        :param height: The black height of the subtree.
+        :param sort_key: The sort key to split at.
+        :return: The roots and the black heights of both parts.
+        '''
+        if not node:
+            return NIL, 0, NIL, 0
+        child_height = height - node.is_black()
+        left, right = node.left, node.right
+        if node.sort_key < sort_key:
+            mid_root, mid_height, right_root, right_height = self._split_node(right, child_height, sort_key)
+            self._join_nodes(left, child_height, node, mid_root, mid_height)
+            return self._root, self._black_height, right_root, right_height
+        else:
+            left_root, left_height, mid_root, mid_height = self._split_node(left, child_height, sort_key)
+            self._join_nodes(mid_root, mid_height, node, right, child_height)
+            return left_root, left_height, self._root, self._black_height
+
+    def _fix_insert(self, node: RBTreeNode) -> None:
+        '''
+        Restore the red-black properties after attaching a red node.
+
+        The classic case chain as one loop: recoloring moves the violation two
+        levels up, and at most two rotations finish the fix-up. Rotations are
+        inlined and the relatives are kept in locals to avoid a call and a
+        property lookup per step.
+        '''
+        sized = self._sized
+        trace = self._trace
+        parent = node.parent
+        while parent is not None and parent.red:
+            gparent = parent.parent
+            if parent is gparent.left:
+                uncle = gparent.right
+                if uncle.red:
+                    parent.red = uncle.red = False
+                    gparent.red = True
+                    if trace is not None:
+                        trace.append('insert_case_1')
+                    node = gparent
+                    parent = node.parent
+                    continue
+                if node is parent.right:
+                    if trace is not None:
+                        trace.append('insert_case_2')
+                    child = node.left
+                    parent.right = child
+                    if child:
+                        child.parent = parent
+                    top = parent.parent
+                    node.parent = top
+                    if top is None:
+                        self._root = node
+                    elif parent is top.left:
+                        top.left = node
+                    else:
+                        top.right = node
+                    node.left = parent
+                    parent.parent = node
+                    self._rotations += 1
+                    if sized:
+                        node.size = parent.size
+                        parent.size = parent.left.size + parent.right.size + 1
+                    node, parent = parent, node
+                if trace is not None:
+                    trace.append('insert_case_3')
+                parent.red = False
+                gparent.red = True
+                child = parent.right
+                gparent.left = child
+                if child:
+                    child.parent = gparent
+                top = gparent.parent
+                parent.parent = top
+                if top is None:
+                    self._root = parent
+                elif gparent is top.left:
+                    top.left = parent
+                else:
+                    top.right = parent
+                parent.right = gparent
+                gparent.parent = parent
+                self._rotations += 1
+                if sized:
+                    parent.size = gparent.size
+                    gparent.size = gparent.left.size + gparent.right.size + 1
+            else:
+                uncle = gparent.left
+                if uncle.red:
+                    parent.red = uncle.red = False
+                    gparent.red = True
+                    if trace is not None:
+                        trace.append('insert_case_1')
+                    node = gparent
+                    parent = node.parent
+                    continue
+                if node is parent.left:
+                    if trace is not None:
+                        trace.append('insert_case_2')
+                    child = node.right
+                    parent.left = child
+                    if child:
+                        child.parent = parent
+                    top = parent.parent
+                    node.parent = top
+                    if top is None:
+                        self._root = node
+                    elif parent is top.left:
+                        top.left = node
+                    else:
+                        top.right = node
+                    node.right = parent
+                    parent.parent = node
+                    self._rotations += 1
+                    if sized:
+                        node.size = parent.size
+                        parent.size = parent.left.size + parent.right.size + 1
+                    node, parent = parent, node
+                if trace is not None:
+                    trace.append('insert_case_3')
+                parent.red = False
+                gparent.red = True
+                child = parent.left
+                gparent.right = child
+                if child:
+                    child.parent = gparent
+                top = gparent.parent
+                parent.parent = top
+                if top is None:
+                    self._root = parent
+                elif gparent is top.left:
+                    top.left = parent
+                else:
+                    top.right = parent
+                parent.left = gparent
+                gparent.parent = parent
+                self._rotations += 1
+                if sized:
+                    parent.size = gparent.size
+                    gparent.size = gparent.left.size + gparent.right.size + 1
+            return
+
+        if parent is None and node.red:
+            node.red = False
+            self._black_height += 1
+            if trace is not None:
+                trace.append('insert_root')
 
     def _replace(self, node: RBTreeNode, child: RBTreeNode) -> None:
         if not node.parent:
-            self.root = child
+            self._root = child
         elif node.is_left():
             node.parent.left = child
         else:
             node.parent.right = child
-        child.parent = node.parent
+        if child:
+            child.parent = node.parent
 
     def _delete(self, node: RBTreeNode) -> None:
         if node.left and node.right:
             raise RuntimeError('Attempting to delete a node with both children existing (expected <= 1)')
 
         child = node.left if node.left else node.right
+        parent = node.parent
         self._replace(node, child)
         if node.is_black():
             if child.is_red():
                 child.color_black()
+                if self._trace is not None:
+                    self._trace.append('delete_blacken')
             else:
-                self._fix_delete(child)
+                self._fix_delete(child, parent)
         del node
-  
-    def _fix_delete(self, node: RBTreeNode):
-        self._del_case_1(node)
-
-    def _del_case_1(self, node: RBTreeNode) -> None:
-        if not node.parent:
-            return
-        self._del_case_2(node)
-
-    def _del_case_2(self, node: RBTreeNode) -> None:
-        bro = node.bro
-        if bro.is_red():
-            node.parent.color_red()
-            bro.color_black()
-            if node.is_left():
-                self._left_rotate(node.parent)
-            else:
-                self._right_rotate(node.parent)
-        self._del_case_3(node)
-
-    def _del_case_3(self, node: RBTreeNode) -> None:
-        bro = node.bro
-        if (
-            node.parent.is_black()
-            and bro.is_black()
-            and bro.left.is_black()
-            and bro.right.is_black()
-        ):
-            bro.color_red()
-            self._del_case_1(node.parent)
-        else:
-            self._del_case_4(node)
-
-    def _del_case_4(self, node: RBTreeNode) -> None:
-        bro = node.bro
-        if (
-            node.parent.is_red()
-            and bro.is_black()
-            and bro.left.is_black()
-            and bro.right.is_black()
-        ):
-            bro.color_red()
-            node.parent.color_black()
-        else:
-            self._del_case_5(node)
-
-    def _del_case_5(self, node: RBTreeNode) -> None:
-        bro = node.bro
-
-        if bro.is_black():
-            if (
-                node.is_left()
-                and bro.right.is_black()
-                and bro.left.is_red()
-            ):
-                bro.color_red()
-                bro.left.color_black()
-                self._right_rotate(bro)
-            elif (
-                node.is_right()
-                and bro.right.is_red()
-                and bro.left.is_black()
-            ):
-                bro.color_red()
-                bro.right.color_black()
-                self._left_rotate(bro)
-        self._del_case_6(node)
 
-    def _del_case_6(self, node: RBTreeNode) -> None:
-        bro = node.bro
+    def _fix_delete(self, node: RBTreeNode, parent: Optional[RBTreeNode]) -> None:
+        '''
+        Restore the red-black properties after removing a black node.
 
-        bro.color = node.parent.color
-        node.parent.color_black()
+        ``node`` took the place of the removed node and is one black short. It
+        may be the NIL sentinel, which does not know its parent, so the parent
+        is passed alongside it. As in :meth:`_fix_insert`, the case chain is
+        a single loop with the rotations inlined.
+        '''
+        sized = self._sized
+        trace = self._trace
+        while parent is not None and not node.red:
+            if node is parent.left:
+                bro = parent.right
+                if bro.red:
+                    if trace is not None:
+                        trace.append('delete_case_1')
+                    bro.red = False
+                    parent.red = True
+                    child = bro.left
+                    parent.right = child
+                    if child:
+                        child.parent = parent
+                    top = parent.parent
+                    bro.parent = top
+                    if top is None:
+                        self._root = bro
+                    elif parent is top.left:
+                        top.left = bro
+                    else:
+                        top.right = bro
+                    bro.left = parent
+                    parent.parent = bro
+                    self._rotations += 1
+                    if sized:
+                        bro.size = parent.size
+                        parent.size = parent.left.size + parent.right.size + 1
+                    bro = parent.right
+                if not bro.left.red and not bro.right.red:
+                    bro.red = True
+                    if trace is not None:
+                        trace.append('delete_case_2')
+                    node, parent = parent, parent.parent
+                    continue
+                if not bro.right.red:
+                    if trace is not None:
+                        trace.append('delete_case_3')
+                    nephew = bro.left
+                    nephew.red = False
+                    bro.red = True
+                    child = nephew.right
+                    bro.left = child
+                    if child:
+                        child.parent = bro
+                    top = bro.parent
+                    nephew.parent = top
+                    if top is None:
+                        self._root = nephew
+                    elif bro is top.left:
+                        top.left = nephew
+                    else:
+                        top.right = nephew
+                    nephew.right = bro
+                    bro.parent = nephew
+                    self._rotations += 1
+                    if sized:
+                        nephew.size = bro.size
+                        bro.size = bro.left.size + bro.right.size + 1
+                    bro = nephew
+                if trace is not None:
+                    trace.append('delete_case_4')
+                bro.red = parent.red
+                parent.red = False
+                bro.right.red = False
+                child = bro.left
+                parent.right = child
+                if child:
+                    child.parent = parent
+                top = parent.parent
+                bro.parent = top
+                if top is None:
+                    self._root = bro
+                elif parent is top.left:
+                    top.left = bro
+                else:
+                    top.right = bro
+                bro.left = parent
+                parent.parent = bro
+                self._rotations += 1
+                if sized:
+                    bro.size = parent.size
+                    parent.size = parent.left.size + parent.right.size + 1
+            else:
+                bro = parent.left
+                if bro.red:
+                    if trace is not None:
+                        trace.append('delete_case_1')
+                    bro.red = False
+                    parent.red = True
+                    child = bro.right
+                    parent.left = child
+                    if child:
+                        child.parent = parent
+                    top = parent.parent
+                    bro.parent = top
+                    if top is None:
+                        self._root = bro
+                    elif parent is top.left:
+                        top.left = bro
+                    else:
+                        top.right = bro
+                    bro.right = parent
+                    parent.parent = bro
+                    self._rotations += 1
+                    if sized:
+                        bro.size = parent.size
+                        parent.size = parent.left.size + parent.right.size + 1
+                    bro = parent.left
+                if not bro.left.red and not bro.right.red:
+                    bro.red = True
+                    if trace is not None:
+                        trace.append('delete_case_2')
+                    node, parent = parent, parent.parent
+                    continue
+                if not bro.left.red:
+                    if trace is not None:
+                        trace.append('delete_case_3')
+                    nephew = bro.right
+                    nephew.red = False
+                    bro.red = True
+                    child = nephew.left
+                    bro.right = child
+                    if child:
+                        child.parent = bro
+                    top = bro.parent
+                    nephew.parent = top
+                    if top is None:
+                        self._root = nephew
+                    elif bro is top.left:
+                        top.left = nephew
+                    else:
+                        top.right = nephew
+                    nephew.left = bro
+                    bro.parent = nephew
+                    self._rotations += 1
+                    if sized:
+                        nephew.size = bro.size
+                        bro.size = bro.left.size + bro.right.size + 1
+                    bro = nephew
+                if trace is not None:
+                    trace.append('delete_case_4')
+                bro.red = parent.red
+                parent.red = False
+                bro.left.red = False
+                child = bro.right
+                parent.left = child
+                if child:
+                    child.parent = parent
+                top = parent.parent
+                bro.parent = top
+                if top is None:
+                    self._root = bro
+                elif parent is top.left:
+                    top.left = bro
+                else:
+                    top.right = bro
+                bro.right = parent
+                parent.parent = bro
+                self._rotations += 1
+                if sized:
+                    bro.size = parent.size
+                    parent.size = parent.left.size + parent.right.size + 1
+            return
 
-        if node.is_left():
-            bro.right.color_black()
-            self._left_rotate(node.parent)
+        if node.red:
+            node.red = False
+            if trace is not None:
+                trace.append('delete_blacken')
         else:
-            bro.left.color_black()
-            self._right_rotate(node.parent)
+            self._black_height -= 1
 
     def _traverse_preorder(self, node):
         if node:
@@ -304,84 +1831,42 @@ class RBTree:
             yield from self._traverse_preorder(node.left)
             yield from self._traverse_preorder(node.right)
 
-    def _traverse_inorder(self, node):
-        if node:
-            yield from self._traverse_inorder(node.left)
-            yield node
-            yield from self._traverse_inorder(node.right)
-
     def _traverse_postorder(self, node):
         if node:
             yield from self._traverse_postorder(node.left)
             yield from self._traverse_postorder(node.right)
             yield node
 
-    def _left_rotate(self, x: RBTreeNode):
-        y = x.right
-        x.right = y.left
-
-        if y.left:
-            y.left.parent = x
-
-        y.parent = x.parent
-
-        if not x.parent:
-            self._root = y
-        elif x.is_left():
-            x.parent.left = y
-        else:
-            x.parent.right = y
-
-        y.left = x
-        x.parent = y
-
-    def _right_rotate(self, x: RBTreeNode):
-        y = x.left
-        x.left = y.right
-
-        if y.right:
-            y.right.parent = x
-
-        y.parent = x.parent
-
-        if not x.parent:
-            self._root = y
-        elif x.is_left():
-            x.parent.left = y
-        else:
-            x.parent.right = y
-
-        y.right = x
-        x.parent = y
-
-    def _print_tree(
-        self, 
-        node: RBTreeNode, 
-        indent: str, 
-        right: bool, 
-        root: bool = False, 
-        hash_key: bool = False,
-    ) -> None:
-        if not node:
-            return
-        
-        line = indent
-        if root:
-            line += '--> '
-            indent += '    '
-        elif right:
-            line += '└─R '
-            indent += '    '
-        else:
-            line += '├─L '
-            indent += '│   '
-        
-        k = repr(hash(node.key)) if hash_key else repr(node.key)
-        line += f'{k}:{repr(node.value)} ({node.color.name})'
-        print(line)
+    def _iter_tree_lines(
+        self,
+        hash_key: bool,
+        max_depth: Optional[int],
+        max_nodes: Optional[int],
+    ) -> Iterator[str]:
+        '''
+        Generate the lines of the tree drawing in preorder with a stack.
 
-        self._print_tree(node.left, indent, False, hash_key=hash_key)
-        self._print_tree(node.right, indent, True, hash_key=hash_key)
+        Children below ``max_depth`` and the nodes past ``max_nodes`` are
+        drawn as ``...``.
+        '''
+        count = 0
+        stack = [(self._root, '', '--> ', 0)] if self._root else []
+        while stack:
+            node, indent, branch, depth = stack.pop()
+            if (max_depth is not None and depth > max_depth) or (max_nodes is not None and count >= max_nodes):
+                yield f'{indent}{branch}...\n'
+                if max_nodes is not None and count >= max_nodes:
+                    return
+                continue
+            count += 1
+
+            k = repr(hash(node.key)) if hash_key else repr(node.key)
+            yield f'{indent}{branch}{k}:{repr(node.value)} ({node.color.name})\n'
+            indent += '│   ' if branch == '├─L ' else '    '
+            if node.right:
+                stack.append((node.right, indent, '└─R ', depth + 1))
+            if node.left:
+                stack.append((node.left, indent, '├─L ', depth + 1))
 
     def _get_node(self, key: Hashable, raise_error: bool = False) -> Optional[RBTreeNode]:
         '''
@@ -392,32 +1877,35 @@ class RBTree:
         :raises KeyError: If node with given key was not found.
         :return: A node in the tree if exists, else None.
         '''
+        sort_key = self._get_sort_key(key)
+        if self._index is not None:
+            current = self._index.get(sort_key)
+            if current is None and raise_error:
+                raise KeyError(key)
+            return current
+
         current = self._root
         while current:
-            if key > current:
-                current = current.right
-            elif key < current:
+            if sort_key < current.sort_key:
                 current = current.left
+            elif current.sort_key < sort_key:
+                current = current.right
             else:
                 return current
         if raise_error:
             raise KeyError(key)
         return None
 
-    def _get_leaf(self, key: Hashable):
-        leaf = None
-        current = self._root
-        while current:
-            leaf = current
-            if key > current:
-                current = current.right
-            elif key < current:
-                current = current.left
-            else:
-                return None
-        return leaf
+    def _get_sort_key(self, key: Hashable) -> Any:
+        '''Get the value the tree orders the key by.'''
+        if self._key is None:
+            return key
+        return self._key(key)
 
     def _swap_kv(self, a: RBTreeNode, b: RBTreeNode) -> None:
-        k, v = a.key, a.value
-        a.key, a.value = b.key, b.value
-        b.key, b.value = k, v
+        k, v, sk = a.key, a.value, a.sort_key
+        a.key, a.value, a.sort_key = b.key, b.value, b.sort_key
+        b.key, b.value, b.sort_key = k, v, sk
+        if self._index is not None:
+            self._index[a.sort_key] = a
+            self._index[b.sort_key] = b
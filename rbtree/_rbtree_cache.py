@@ -0,0 +1,225 @@
+import time
+from typing import Any, Callable, Hashable, Iterator, Optional, Tuple
+
+from ._rbtree import RBTree
+
+
+_MISSING = object()
+
+
+class _CacheEntry:
+    __slots__ = ('value', 'tick', 'expiry')
+
+    def __init__(self, value: Any, tick: int, expiry: Optional[Tuple[float, int]]) -> None:
+        self.value = value
+        self.tick = tick
+        self.expiry = expiry
+
+
+class RBTreeCache:
+    '''
+    A sorted map that evicts its least recently used and its expired entries.
+
+    The entries are kept in an :class:`RBTree` by key, and two more trees
+    order them by last use and by expiry time. Getting or setting an entry
+    takes O(log n). Once there are more than ``max_size`` entries, the least
+    recently used are evicted. Entries expire ``ttl`` seconds after they are
+    set. An expired entry is dropped when it is read. :meth:`expire` drops all
+    of them at once by removing a range of the expiry tree, which takes
+    O(log n) per dropped entry. :meth:`set` calls it once the earliest
+    expiry time has passed.
+
+    The counters ``hits``, ``misses``, ``evictions`` (for ``max_size``) and
+    ``expirations`` (for ``ttl``) can be reset by assigning 0.
+
+    :param max_size: The largest number of entries, unlimited if None.
+    :param ttl: The default lifetime of an entry in seconds, unlimited if None.
+    :param key: The key function of the tree of entries.
+    :param timer: The clock the lifetimes are measured by.
+    '''
+
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        ttl: Optional[float] = None,
+        key: Optional[Callable[[Hashable], Any]] = None,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_size is not None and max_size < 1:
+            raise ValueError(f'max_size must be positive, got {max_size}')
+        if ttl is not None and ttl <= 0:
+            raise ValueError(f'ttl must be positive, got {ttl}')
+        self.max_size = max_size
+        self.ttl = ttl
+        self._timer = timer
+        self._entries = RBTree(key)
+        self._recency = RBTree()
+        self._expiry = RBTree()
+        # No entry expires before this time.
+        self._next_expiry = float('inf')
+        self._tick = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __getitem__(self, key: Hashable):
+        '''
+        Get the value of a live entry and mark it as used.
+
+        :raises KeyError: If there is no such entry or it expired.
+        '''
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key: Hashable, value: Any) -> None:
+        self.set(key, value)
+
+    def __delitem__(self, key: Hashable):
+        self._drop(key, self._entries[key])
+
+    def __len__(self):
+        '''Get the number of entries, including the expired ones not dropped yet.'''
+        return len(self._entries)
+
+    def __iter__(self):
+        return self.keys()
+
+    def __contains__(self, key: Hashable) -> bool:
+        '''Whether there is a live entry, without marking it as used.'''
+        entry = self._entries.get(key)
+        return entry is not None and not self._expired(entry)
+
+    def __bool__(self):
+        return len(self) != 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        '''Get the value of a live entry and mark it as used, or the default.'''
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry):
+            self._drop(key, entry)
+            self.expirations += 1
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        del self._recency[entry.tick]
+        entry.tick = self._next_tick(key)
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: Any = _MISSING) -> None:
+        '''
+        Insert or rewrite an entry, drop the expired ones and evict the least
+        recently used while there are too many.
+
+        :param ttl: The lifetime of the entry in seconds, None for unlimited.
+            The ``ttl`` of the cache if not given.
+        '''
+        if ttl is _MISSING:
+            ttl = self.ttl
+        elif ttl is not None and ttl <= 0:
+            raise ValueError(f'ttl must be positive, got {ttl}')
+        now = self._timer()
+        if self._next_expiry <= now:
+            self.expire(now)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            del self._recency[entry.tick]
+            if entry.expiry is not None:
+                del self._expiry[entry.expiry]
+        tick = self._next_tick(key)
+        expiry = None
+        if ttl is not None:
+            expiry = (now + ttl, tick)
+            self._expiry[expiry] = key
+            self._next_expiry = min(self._next_expiry, expiry[0])
+        if entry is None:
+            self._entries[key] = _CacheEntry(value, tick, expiry)
+        else:
+            entry.value, entry.tick, entry.expiry = value, tick, expiry
+
+        max_size = self.max_size
+        if max_size is not None:
+            while len(self._entries) > max_size:
+                oldest = self._recency[self._recency.min()]
+                self._drop(oldest, self._entries[oldest])
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = _MISSING) -> Any:
+        '''
+        Remove an entry and get its value.
+
+        :raises KeyError: If there is no live entry and no default is given.
+        '''
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._drop(key, entry)
+            if not self._expired(entry):
+                return entry.value
+            self.expirations += 1
+        if default is _MISSING:
+            raise KeyError(key)
+        return default
+
+    def expire(self, now: Optional[float] = None) -> int:
+        '''
+        Drop the entries that expired by ``now``.
+
+        :param now: The time by the timer of the cache, the current one if None.
+        :return: The number of dropped entries.
+        '''
+        if now is None:
+            now = self._timer()
+        expired = self._expiry.pop_range(hi=(now, float('inf'))) if self._expiry else []
+        entries = self._entries
+        for expiry, key in expired:
+            del self._recency[entries[key].tick]
+            del entries[key]
+        self._next_expiry = self._expiry.min()[0] if self._expiry else float('inf')
+        self.expirations += len(expired)
+        return len(expired)
+
+    def keys(self) -> Iterator[Hashable]:
+        '''Iterate over the keys of the live entries in sorted order.'''
+        for key, _ in self.items():
+            yield key
+
+    def values(self) -> Iterator[Any]:
+        '''Iterate over the values of the live entries in the order of their keys.'''
+        for _, value in self.items():
+            yield value
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        '''Iterate over the live ``(key, value)`` pairs in sorted order, without marking them as used.'''
+        now = self._timer()
+        for key, entry in self._entries.items():
+            if not self._expired(entry, now):
+                yield key, entry.value
+
+    def clear(self) -> None:
+        '''Drop every entry. The counters are kept.'''
+        self._entries.clear()
+        self._recency.clear()
+        self._expiry.clear()
+        self._next_expiry = float('inf')
+
+    def _expired(self, entry: _CacheEntry, now: Optional[float] = None) -> bool:
+        if entry.expiry is None:
+            return False
+        return entry.expiry[0] <= (self._timer() if now is None else now)
+
+    def _next_tick(self, key: Hashable) -> int:
+        '''Record a use of a key in the recency tree, after all the uses before it.'''
+        self._tick += 1
+        self._recency[self._tick] = key
+        return self._tick
+
+    def _drop(self, key: Hashable, entry: _CacheEntry) -> None:
+        del self._entries[key]
+        del self._recency[entry.tick]
+        if entry.expiry is not None:
+            del self._expiry[entry.expiry]
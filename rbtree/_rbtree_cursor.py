@@ -0,0 +1,139 @@
+from typing import TYPE_CHECKING, Any, Hashable, Optional
+
+from ._rbtree_node import RBTreeNode
+
+if TYPE_CHECKING:
+    from ._rbtree import RBTree
+
+
+class RBTreeCursor:
+    '''
+    A position in an RBTree.
+
+    A cursor remembers a node, so seeking a nearby key or inserting next to it
+    starts from there instead of from the root and visits O(log d) nodes for
+    keys at distance ``d``. Inserting keys in nearly sorted order through a
+    cursor takes O(1) amortized time per key.
+
+    If the tree is changed other than through the cursor, the cursor finds
+    its key again from the root. If the key was removed, it moves to the next
+    one. A cursor moved past either end is false and has no key.
+    '''
+
+    __slots__ = ('_tree', '_node', '_sort_key', '_version')
+
+    def __init__(self, tree: 'RBTree', node: RBTreeNode) -> None:
+        self._tree = tree
+        self._set(node)
+
+    def __bool__(self):
+        return bool(self._get_node())
+
+    def __repr__(self):
+        node = self._get_node()
+        position = repr(node.key) if node else 'end'
+        return f'<{self.__class__.__name__} {position}>'
+
+    @property
+    def key(self) -> Hashable:
+        '''Get the key at the cursor.'''
+        return self._get_node(True).key
+
+    @property
+    def value(self) -> Any:
+        '''Get the value at the cursor.'''
+        return self._get_node(True).value
+
+    @value.setter
+    def value(self, value: Any) -> None:
+        node = self._get_node(True)
+        self._tree._before_write()
+        node.value = value
+
+    @property
+    def node(self) -> Optional[RBTreeNode]:
+        '''Get the node at the cursor, None past the end.'''
+        return self._get_node() or None
+
+    def next(self) -> 'RBTreeCursor':
+        '''Move to the next key.'''
+        self._set(self._tree._successor(self._get_node(True)))
+        return self
+
+    def prev(self) -> 'RBTreeCursor':
+        '''Move to the previous key.'''
+        self._set(self._tree._predecessor(self._get_node(True)))
+        return self
+
+    def seek(self, key: Hashable) -> 'RBTreeCursor':
+        '''
+        Move to the first key not less than ``key``.
+
+        :param key: The key to look for.
+        '''
+        tree = self._tree
+        sort_key = tree._get_sort_key(key)
+        node, parent = tree._finger_search(self._get_node() or None, sort_key)
+        if not node and parent is not None:
+            node = parent if sort_key < parent.sort_key else tree._successor(parent)
+        self._set(node)
+        return self
+
+    def insert(self, key: Hashable, value: Any) -> 'RBTreeCursor':
+        '''
+        Insert a new node or rewrite existing, searching from the cursor.
+
+        The cursor moves to the key.
+        '''
+        self._set(self._tree._insert_near(self._get_node() or None, key, value))
+        return self
+
+    def insert_after(self, key: Hashable, value: Any) -> 'RBTreeCursor':
+        '''
+        Insert a key that sorts after the key at the cursor.
+
+        The cursor moves to the key.
+
+        :raises ValueError: If the cursor is past the end or ``key`` does not
+            sort after its key.
+        '''
+        node = self._get_node(True)
+        if not node.sort_key < self._tree._get_sort_key(key):
+            raise ValueError(f'{key!r} does not sort after {node.key!r}')
+        return self.insert(key, value)
+
+    def insert_before(self, key: Hashable, value: Any) -> 'RBTreeCursor':
+        '''
+        Insert a key that sorts before the key at the cursor.
+
+        The cursor moves to the key.
+
+        :raises ValueError: If the cursor is past the end or ``key`` does not
+            sort before its key.
+        '''
+        node = self._get_node(True)
+        if not self._tree._get_sort_key(key) < node.sort_key:
+            raise ValueError(f'{key!r} does not sort before {node.key!r}')
+        return self.insert(key, value)
+
+    def _set(self, node: RBTreeNode) -> None:
+        self._node = node
+        self._sort_key = node.sort_key
+        self._version = self._tree._version
+
+    def _get_node(self, raise_error: bool = False) -> RBTreeNode:
+        '''
+        Get the node at the cursor, finding it again if the tree has changed.
+
+        :param raise_error: If true, raise a ValueError if the cursor is past the end.
+        :raises ValueError: If the cursor is past the end.
+        '''
+        tree = self._tree
+        if self._version != tree._version:
+            if self._node:
+                self._node = tree._find_ge(self._sort_key, True)
+                self._sort_key = self._node.sort_key
+            self._version = tree._version
+        if raise_error and not self._node:
+            raise ValueError(f'{self.__class__.__name__} is past the end')
+        return self._node
@@ -0,0 +1,344 @@
+import mmap
+import os
+import pickle
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import Any, Callable, Hashable, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+
+MAGIC = b'RBT\x01'
+
+# The magic, the kinds of the keys and of the values, the number of pairs,
+# and the offsets of the values and of the end of the file.
+_HEADER = struct.Struct('<4scc2xQQQ')
+
+# Keys or values are stored as an array of int64 (``q``) or float64 (``d``)
+# when all of them fit, and as a table of offsets followed by one pickle per
+# item (``p``) otherwise. All numbers are little-endian.
+_NUMERIC_KINDS = (b'q', b'd')
+_PICKLED = b'p'
+
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+
+def _get_kind(items: List[Any]) -> bytes:
+    if all(type(item) is int for item in items):
+        if not items or (_INT64_MIN <= min(items) and max(items) <= _INT64_MAX):
+            return b'q'
+    elif all(type(item) is float for item in items):
+        return b'd'
+    return _PICKLED
+
+
+def _little_endian(data: array) -> array:
+    '''Get an array in little-endian order from one in native order, or back.'''
+    if sys.byteorder != 'little':
+        data = array(data.typecode, data)
+        data.byteswap()
+    return data
+
+
+def _from_bytes(typecode: str, data: Union[bytes, memoryview]) -> array:
+    '''Get an array in native order from little-endian bytes.'''
+    items = array(typecode)
+    items.frombytes(data)
+    return _little_endian(items)
+
+
+def _encode(items: List[Any], kind: bytes) -> bytes:
+    if kind in _NUMERIC_KINDS:
+        return _little_endian(array(kind.decode(), items)).tobytes()
+    blobs = [pickle.dumps(item, pickle.HIGHEST_PROTOCOL) for item in items]
+    offsets = array('Q', accumulate(map(len, blobs), initial=0))
+    data = _little_endian(offsets).tobytes() + b''.join(blobs)
+    return data + bytes(-len(data) % 8)
+
+
+def dump(path: Union[str, os.PathLike], keys: List[Hashable], values: List[Any]) -> None:
+    '''
+    Write pairs sorted by key to a file.
+
+    Keys or values that are not all ints or all floats are pickled, so the
+    file is only safe to read back from a trusted source.
+
+    :param path: The path of the file.
+    :param keys: The keys in tree order.
+    :param values: The values of the keys.
+    '''
+    key_kind, value_kind = _get_kind(keys), _get_kind(values)
+    key_data = _encode(keys, key_kind)
+    value_data = _encode(values, value_kind)
+    values_offset = _HEADER.size + len(key_data)
+    end = values_offset + len(value_data)
+    with open(path, 'wb') as f:
+        f.write(_HEADER.pack(MAGIC, key_kind, value_kind, len(keys), values_offset, end))
+        f.write(key_data)
+        f.write(value_data)
+
+
+def _read_header(data: Union[bytes, memoryview, mmap.mmap]) -> Tuple[bytes, bytes, int, int, int]:
+    if len(data) < _HEADER.size:
+        raise ValueError('Not an RBTree file: too short')
+    magic, key_kind, value_kind, count, values_offset, end = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f'Not an RBTree file: bad magic {magic!r}')
+    if len(data) < end:
+        raise ValueError(f'Truncated RBTree file: expected {end} bytes, got {len(data)}')
+    return key_kind, value_kind, count, values_offset, end
+
+
+def load(path: Union[str, os.PathLike]) -> Tuple[List[Hashable], List[Any]]:
+    '''
+    Read the pairs written by :func:`dump`.
+
+    .. warning::
+        Keys and values that are not all ints or all floats are unpickled, and
+        unpickling can run arbitrary code: never load a file from an untrusted
+        source.
+
+    :return: The keys and the values.
+    :raises ValueError: If the file is not in the format.
+    '''
+    with open(path, 'rb') as f:
+        data = f.read()
+    key_kind, value_kind, count, values_offset, end = _read_header(data)
+    view = memoryview(data)
+    keys = _decode(view[_HEADER.size:values_offset], key_kind, count)
+    values = _decode(view[values_offset:end], value_kind, count)
+    return keys, values
+
+
+def _decode(data: memoryview, kind: bytes, count: int) -> List[Any]:
+    if kind in _NUMERIC_KINDS:
+        return _from_bytes(kind.decode(), data).tolist()
+    offsets = _from_bytes('Q', data[:8 * (count + 1)]).tolist()
+    blobs = data[8 * (count + 1):]
+    loads = pickle.loads
+    return [loads(blobs[start:stop]) for start, stop in zip(offsets, offsets[1:])]
+
+
+class _PickledColumn:
+    '''The items of a pickled section, unpickled when accessed.'''
+
+    def __init__(self, offsets: Sequence[int], blobs: memoryview) -> None:
+        self._offsets = offsets
+        self._blobs = blobs
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i: int) -> Any:
+        return pickle.loads(self._blobs[self._offsets[i]:self._offsets[i + 1]])
+
+
+class _SortKeys:
+    '''The results of a key function over a sequence, computed when accessed.'''
+
+    def __init__(self, items: Sequence[Any], key: Callable[[Hashable], Any]) -> None:
+        self._items = items
+        self._key = key
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, i: int) -> Any:
+        return self._key(self._items[i])
+
+
+class MappedRBTree:
+    '''
+    A read-only sorted map over a file written by :meth:`RBTree.dump`.
+
+    The file is memory-mapped and searched by binary search, so opening it
+    takes O(1) and a lookup takes O(log n) without building any nodes.
+    Numeric keys and values are read straight from the map; the others are
+    unpickled when they are accessed.
+
+    .. warning::
+        Unpickling can run arbitrary code: never open a file from an
+        untrusted source.
+
+    :param path: The path of the file.
+    :param key: The key function of the dumped tree.
+    :raises ValueError: If the file is not in the format.
+    '''
+
+    def __init__(self, path: Union[str, os.PathLike], key: Optional[Callable[[Hashable], Any]] = None) -> None:
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._key = key
+        self._views = []
+        try:
+            key_kind, value_kind, count, values_offset, end = _read_header(self._mmap)
+            self._len = count
+            self._keys = self._column(_HEADER.size, values_offset, key_kind, count)
+            self._values = self._column(values_offset, end, value_kind, count)
+        except Exception:
+            self.close()
+            raise
+        self._sort_keys = self._keys if key is None else _SortKeys(self._keys, key)
+
+    def __getitem__(self, key: Hashable):
+        '''Get value by key.'''
+        i = self._index(key)
+        if i is None:
+            raise KeyError(key)
+        return self._values[i]
+
+    def __len__(self):
+        '''Get the number of pairs.'''
+        return self._len
+
+    def __iter__(self):
+        for i in range(self._len):
+            yield self._keys[i]
+
+    def __reversed__(self):
+        for i in reversed(range(self._len)):
+            yield self._keys[i]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self._index(key) is not None
+
+    def __bool__(self):
+        return len(self) != 0
+
+    def __enter__(self) -> 'MappedRBTree':
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    @property
+    def key(self) -> Optional[Callable[[Hashable], Any]]:
+        '''Get the key function the keys are ordered by.'''
+        return self._key
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        i = self._index(key)
+        return default if i is None else self._values[i]
+
+    def find(self, key: Hashable):
+        return self[key]
+
+    def keys(self) -> Iterator[Hashable]:
+        return iter(self)
+
+    def values(self) -> Iterator[Any]:
+        for i in range(self._len):
+            yield self._values[i]
+
+    def items(self) -> Iterator[Tuple[Hashable, Any]]:
+        for i in range(self._len):
+            yield self._keys[i], self._values[i]
+
+    def min(self) -> Hashable:
+        '''
+        Get the smallest key.
+
+        :raises ValueError: If the map is empty.
+        '''
+        if not self:
+            raise ValueError('min() of an empty tree')
+        return self._keys[0]
+
+    def max(self) -> Hashable:
+        '''
+        Get the largest key.
+
+        :raises ValueError: If the map is empty.
+        '''
+        if not self:
+            raise ValueError('max() of an empty tree')
+        return self._keys[self._len - 1]
+
+    def irange(
+        self,
+        lo: Optional[Hashable] = None,
+        hi: Optional[Hashable] = None,
+        inclusive: Tuple[bool, bool] = (True, True),
+        reverse: bool = False,
+    ) -> Iterator[Hashable]:
+        '''
+        Lazily iterate over the keys between ``lo`` and ``hi``.
+
+        The bounds work as in :meth:`RBTree.irange`.
+        '''
+        for i in self._irange_positions(lo, hi, inclusive, reverse):
+            yield self._keys[i]
+
+    def irange_items(
+        self,
+        lo: Optional[Hashable] = None,
+        hi: Optional[Hashable] = None,
+        inclusive: Tuple[bool, bool] = (True, True),
+        reverse: bool = False,
+    ) -> Iterator[Tuple[Hashable, Any]]:
+        '''Lazily iterate over the pairs with keys between ``lo`` and ``hi``.'''
+        for i in self._irange_positions(lo, hi, inclusive, reverse):
+            yield self._keys[i], self._values[i]
+
+    def close(self) -> None:
+        '''Unmap the file. The map cannot be used afterwards.'''
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+    def _column(self, start: int, stop: int, kind: bytes, count: int) -> Sequence[Any]:
+        if kind in _NUMERIC_KINDS:
+            if sys.byteorder != 'little':
+                return _from_bytes(kind.decode(), self._mmap[start:stop])
+            return self._view(start, stop, kind.decode())
+        if kind != _PICKLED:
+            raise ValueError(f'Not an RBTree file: unknown kind {kind!r}')
+        table = start + 8 * (count + 1)
+        if sys.byteorder != 'little':
+            offsets = _from_bytes('Q', self._mmap[start:table])
+        else:
+            offsets = self._view(start, table, 'Q')
+        return _PickledColumn(offsets, self._view(table, stop))
+
+    def _view(self, start: int, stop: int, fmt: Optional[str] = None) -> memoryview:
+        '''Get a view of a part of the map, released on :meth:`close`.'''
+        with memoryview(self._mmap) as whole:
+            view = whole[start:stop]
+        self._views.append(view)
+        if fmt is not None:
+            view = view.cast(fmt)
+            self._views.append(view)
+        return view
+
+    def _get_sort_key(self, key: Hashable) -> Any:
+        if self._key is None:
+            return key
+        return self._key(key)
+
+    def _index(self, key: Hashable) -> Optional[int]:
+        '''Get the position of a key, None if it is absent.'''
+        sort_key = self._get_sort_key(key)
+        i = bisect_left(self._sort_keys, sort_key)
+        if i < self._len and not sort_key < self._sort_keys[i]:
+            return i
+        return None
+
+    def _irange_positions(
+        self,
+        lo: Optional[Hashable],
+        hi: Optional[Hashable],
+        inclusive: Tuple[bool, bool],
+        reverse: bool,
+    ) -> Iterable[int]:
+        lo_inclusive, hi_inclusive = inclusive
+        start, stop = 0, self._len
+        if lo is not None:
+            search = bisect_left if lo_inclusive else bisect_right
+            start = search(self._sort_keys, self._get_sort_key(lo))
+        if hi is not None:
+            search = bisect_right if hi_inclusive else bisect_left
+            stop = search(self._sort_keys, self._get_sort_key(hi))
+        positions = range(start, max(start, stop))
+        return reversed(positions) if reverse else positions
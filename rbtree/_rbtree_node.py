@@ -4,6 +4,8 @@ from ._rbtree_color import RBTreeColor
 
 
 class RBTreeNode:
+    __slots__ = ('key', 'value', 'sort_key', 'parent', 'left', 'right', 'red', 'size')
+
     def __init__(
         self,
         key: Optional[Hashable] = None,
@@ -12,23 +14,28 @@ class RBTreeNode:
         parent: Optional['RBTreeNode'] = None,
         left: Optional['RBTreeNode'] = None,
         right: Optional['RBTreeNode'] = None,
+        sort_key: Any = None,
     ) -> None:
         hash(key)
         self.key = key
         self.value = value
+        self.sort_key = key if sort_key is None else sort_key
         self.parent = parent
-        self._color = color
-        self.left = left or RBTreeNode(None, parent=self) if key is not None else None
-        self.right = right or RBTreeNode(None, parent=self) if key is not None else None
+        if not isinstance(color, RBTreeColor):
+            raise TypeError('color must be a RBTreeColor instance')
+        self.red = color is RBTreeColor.RED
+        self.size = 1
+        self.left = left or NIL if key is not None else None
+        self.right = right or NIL if key is not None else None
 
     def __eq__(self, other: Union['RBTreeNode', Hashable]):
-        return hash(self.key) == hash(other)
+        return self.sort_key == self._get_sort_key(other)
 
     def __gt__(self, other: Union['RBTreeNode', Hashable]):
-        return hash(self.key) > hash(other)
+        return self.sort_key > self._get_sort_key(other)
 
     def __lt__(self, other: Union['RBTreeNode', Hashable]):
-        return hash(self.key) < hash(other)
+        return self.sort_key < self._get_sort_key(other)
 
     def __le__(self, other: Union['RBTreeNode', Hashable]):
         return (self < other) or (self == other)
@@ -50,11 +57,17 @@ class RBTreeNode:
     def __repr__(self):
         return f'<{self.__class__.__name__} {str(self)} {self.color.name}>'
 
+    @staticmethod
+    def _get_sort_key(other: Union['RBTreeNode', Hashable]) -> Any:
+        if isinstance(other, RBTreeNode):
+            return other.sort_key
+        return other
+
     @property
     def bro(self) -> Optional['RBTreeNode']:
         '''Get node brother.'''
         if not self.parent:
-            return None 
+            return None
         if self.is_left():
             return self.parent.right
         if self.is_right():
@@ -80,35 +93,35 @@ class RBTreeNode:
 
     @property
     def color(self):
-        return self._color
+        return RBTreeColor.RED if self.red else RBTreeColor.BLACK
 
     @color.setter
     def color(self, color: RBTreeColor):
         if not isinstance(color, RBTreeColor):
             raise TypeError('color must be a RBTreeColor instance')
-        self._color = color
+        self.red = color is RBTreeColor.RED
 
     def is_red(self):
-        return self.color == RBTreeColor.RED
+        return self.red
 
     def is_black(self):
-        return self.color == RBTreeColor.BLACK
+        return not self.red
 
     def color_black(self):
-        self.color = RBTreeColor.BLACK
+        self.red = False
 
     def color_red(self):
-        self.color = RBTreeColor.RED
+        self.red = True
 
     def is_left(self):
         if not self.parent:
             return False
-        return self == self.parent.left
+        return self is self.parent.left
 
     def is_right(self):
         if not self.parent:
             return False
-        return self == self.parent.right
+        return self is self.parent.right
 
     def get_graphviz(self):
         color = f'[fontcolor="{"red" if self.is_red() else "black"}"]'
@@ -117,3 +130,30 @@ class RBTreeNode:
             f'{s} -- "{str(self.left)}"\n'
             f'{s} -- "{str(self.right)}"\n'
         )
+
+
+class RBTreeNil(RBTreeNode):
+    '''
+    The leaf sentinel.
+
+    A single instance (``NIL``) stands in for every empty child of every tree,
+    so it is black, keyless and read-only: its fields never change, which lets
+    any number of nodes and trees point at it at once.
+    '''
+
+    __slots__ = ()
+
+    def __init__(self) -> None:
+        for name in RBTreeNode.__slots__:
+            object.__setattr__(self, name, None)
+        object.__setattr__(self, 'red', False)
+        object.__setattr__(self, 'size', 0)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f'{self.__class__.__name__} is immutable')
+
+    def __bool__(self):
+        return False
+
+
+NIL = RBTreeNil()
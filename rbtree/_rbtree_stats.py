@@ -0,0 +1,131 @@
+from collections import Counter
+from typing import Any, Callable, Dict, List, NamedTuple, Tuple
+
+
+# The colors each fix-up case assigns.
+RECOLORS = {
+    'insert_case_1': 3,  # red uncle: the parent and the uncle go black, the grandparent red
+    'insert_case_2': 0,  # inner child: a rotation turns it into case 3
+    'insert_case_3': 2,  # outer child: a rotation at the grandparent and a color swap
+    'insert_root': 1,  # a red root goes black
+    'delete_case_1': 2,  # red sibling: a rotation makes the sibling black
+    'delete_case_2': 1,  # black sibling with black children: the sibling goes red
+    'delete_case_3': 2,  # red near nephew: a rotation turns it into case 4
+    'delete_case_4': 3,  # red far nephew: a rotation at the parent finishes the fix-up
+    'delete_blacken': 1,  # the red node that took the removed place goes black
+}
+
+
+class OperationStats(NamedTuple):
+    '''The counters of one sampled operation, as given to the listeners.'''
+
+    operation: str
+    depth: int
+    comparisons: int
+    rotations: int
+    recolors: int
+    cases: Tuple[str, ...]
+    seconds: float
+
+
+class RBTreeStats:
+    '''
+    Counters of the work done by the point operations of an :class:`RBTree`.
+
+    Got from :meth:`RBTree.enable_stats`. One in every ``sample_every``
+    inserts, removals and lookups is measured; the others run as if the
+    stats were disabled. The counters are keyed by the operation,
+    ``'insert'``, ``'remove'`` or ``'find'``:
+
+    * ``operations`` -- the number of sampled operations;
+    * ``failures`` -- the number of sampled operations that raised, such as
+      lookups of missing keys, which are left out of the other counters;
+    * ``comparisons`` -- the key comparisons of their searches from the root;
+    * ``rotations`` and ``recolors`` -- the work of their rebalancing;
+    * ``seconds`` -- their total time.
+
+    ``depths`` is a histogram of the number of nodes on the search paths,
+    and ``cases`` counts the fix-up cases hit, such as ``'insert_case_1'``.
+
+    Listeners are called with an :class:`OperationStats` after every sampled
+    operation, which is the place to export to a metrics sink::
+
+        stats = tree.enable_stats(sample_every=100)
+        stats.add_listener(lambda op: histogram.observe(op.seconds))
+    '''
+
+    def __init__(self, sample_every: int = 1) -> None:
+        if sample_every < 1:
+            raise ValueError(f'sample_every must be positive, got {sample_every}')
+        self.sample_every = sample_every
+        self._countdown = sample_every
+        self._listeners = []
+        self.reset()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(sample_every={self.sample_every}, operations={dict(self.operations)})'
+
+    def reset(self) -> None:
+        '''Zero the counters.'''
+        self.operations = Counter()
+        self.failures = Counter()
+        self.comparisons = Counter()
+        self.rotations = Counter()
+        self.recolors = Counter()
+        self.seconds = Counter()
+        self.depths = Counter()
+        self.cases = Counter()
+
+    def add_listener(self, listener: Callable[[OperationStats], Any]) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[OperationStats], Any]) -> None:
+        '''
+        Stop calling a listener.
+
+        :raises ValueError: If the listener was not added.
+        '''
+        self._listeners.remove(listener)
+
+    def as_dict(self) -> Dict[str, Dict[Any, Any]]:
+        '''Get a copy of the counters as plain dicts.'''
+        return {
+            'operations': dict(self.operations),
+            'failures': dict(self.failures),
+            'comparisons': dict(self.comparisons),
+            'rotations': dict(self.rotations),
+            'recolors': dict(self.recolors),
+            'seconds': dict(self.seconds),
+            'depths': dict(sorted(self.depths.items())),
+            'cases': dict(self.cases),
+        }
+
+    def _sample(self) -> bool:
+        '''Count an operation and tell whether to measure it.'''
+        self._countdown -= 1
+        if self._countdown > 0:
+            return False
+        self._countdown = self.sample_every
+        return True
+
+    def _record(
+        self,
+        operation: str,
+        depth: int,
+        comparisons: int,
+        rotations: int,
+        cases: List[str],
+        seconds: float,
+    ) -> None:
+        recolors = sum(RECOLORS[case] for case in cases)
+        self.operations[operation] += 1
+        self.comparisons[operation] += comparisons
+        self.rotations[operation] += rotations
+        self.recolors[operation] += recolors
+        self.seconds[operation] += seconds
+        self.depths[depth] += 1
+        self.cases.update(cases)
+        if self._listeners:
+            stats = OperationStats(operation, depth, comparisons, rotations, recolors, tuple(cases), seconds)
+            for listener in self._listeners:
+                listener(stats)
@@ -0,0 +1,69 @@
+from collections.abc import ItemsView, KeysView, ValuesView
+from typing import Any, Iterable, Iterator, Tuple
+
+
+class RBTreeKeysView(KeysView):
+    '''A live view of the keys of an RBTree, in sorted order.'''
+
+    def __iter__(self) -> Iterator[Any]:
+        for node in self._mapping._iter_nodes():
+            yield node.key
+
+    def __reversed__(self) -> Iterator[Any]:
+        for node in self._mapping._iter_nodes(reverse=True):
+            yield node.key
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({list(self)!r})'
+
+
+class RBTreeValuesView(ValuesView):
+    '''A live view of the values of an RBTree, in the order of their keys.'''
+
+    def __contains__(self, value: Any) -> bool:
+        return any(v is value or v == value for v in self)
+
+    def __iter__(self) -> Iterator[Any]:
+        for node in self._mapping._iter_nodes():
+            yield node.value
+
+    def __reversed__(self) -> Iterator[Any]:
+        for node in self._mapping._iter_nodes(reverse=True):
+            yield node.value
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({list(self)!r})'
+
+
+class RBTreeItemsView(ItemsView):
+    '''A live view of the ``(key, value)`` pairs of an RBTree, in sorted order.'''
+
+    def __contains__(self, item: Tuple[Any, Any]) -> bool:
+        key, value = item
+        node = self._mapping._get_node(key)
+        return node is not None and (node.value is value or node.value == value)
+
+    def __iter__(self) -> Iterator[Tuple[Any, Any]]:
+        for node in self._mapping._iter_nodes():
+            yield node.key, node.value
+
+    def __reversed__(self) -> Iterator[Tuple[Any, Any]]:
+        for node in self._mapping._iter_nodes(reverse=True):
+            yield node.key, node.value
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({list(self)!r})'
+
+
+def mapping_items(items: Any) -> Iterable[Tuple[Any, Any]]:
+    '''
+    Get the ``(key, value)`` pairs of a mapping, or the pairs themselves.
+
+    As with ``dict``, anything with ``keys()`` is taken for a mapping, trees
+    included, and its pairs are read with ``items()`` or else by key.
+    '''
+    if not hasattr(items, 'keys'):
+        return items
+    if hasattr(items, 'items'):
+        return items.items()
+    return ((k, items[k]) for k in items.keys())
@@ -0,0 +1,96 @@
+import random
+
+import pytest
+
+from .. import ArrayRBTree, RBTree, create_tree
+
+
+_default_data = dict((i, str(i)) for i in range(100))
+
+
+def check_tree(tree: ArrayRBTree, data: dict) -> None:
+    assert tree.keys() == tuple(sorted(data))
+    assert tree.values() == tuple(data[k] for k in sorted(data))
+    assert len(tree) == len(data)
+    assert not tree._red[tree._root]
+
+
+@pytest.mark.parametrize(
+    'typecode, data',
+    (
+        ('q', _default_data.copy()),
+        ('q', dict((-i, i) for i in range(1000))),
+        ('d', dict((i / 3, i) for i in range(1000))),
+    ),
+)
+def test_insert_remove(typecode, data):
+    t = ArrayRBTree(data, typecode=typecode)
+    check_tree(t, data)
+    for k in list(data)[::2]:
+        t.remove(k)
+        del data[k]
+    check_tree(t, data)
+    for k in list(data)[:10]:
+        t.insert(k, 'new')
+        data[k] = 'new'
+        assert t.find(k) == 'new'
+    check_tree(t, data)
+
+
+def test_free_list_reuses_slots():
+    t = ArrayRBTree()
+    for i in range(100):
+        t[i] = i
+    for i in range(50):
+        del t[i]
+    with pytest.raises(OverflowError):
+        t[2 ** 70] = 0
+    for i in range(100, 150):
+        t[i] = i
+    assert len(t._keys) == 101
+    assert len(t) == 100
+
+
+def test_keys_converted_to_typecode():
+    t = ArrayRBTree(typecode='d')
+    t[2 ** 53] = 'a'
+    t[2 ** 53 + 1] = 'b'
+    assert t.keys() == (2.0 ** 53,) and 2 ** 53 + 1 in t
+    assert t[2 ** 53] == 'b'
+    del t[2 ** 53 + 1]
+    assert not t
+    t = ArrayRBTree({1: 'a'})
+    assert 2 ** 70 not in t and t.get(2 ** 70) is None
+    with pytest.raises(KeyError):
+        del t[2 ** 70]
+
+
+def test_random_operations():
+    rnd = random.Random(0)
+    t = ArrayRBTree()
+    data = {}
+    for _ in range(5000):
+        k = rnd.randrange(500)
+        if rnd.random() < 0.6:
+            t[k] = data[k] = rnd.random()
+        elif k in data:
+            del t[k], data[k]
+    check_tree(t, data)
+
+
+def test_errors():
+    t = ArrayRBTree(_default_data)
+    with pytest.raises(KeyError):
+        t.find(1000)
+    with pytest.raises(KeyError):
+        del t[1000]
+    t.clear()
+    assert not t
+    assert t.get(1) is None
+
+
+def test_create_tree():
+    assert isinstance(create_tree(), RBTree)
+    assert isinstance(create_tree('array', typecode='d'), ArrayRBTree)
+    with pytest.raises(ValueError):
+        create_tree('btree')
@@ -0,0 +1,55 @@
+import asyncio
+
+import pytest
+
+from .. import AsyncRBTree, RBTree
+
+
+def test_api():
+    async def main():
+        t = AsyncRBTree(RBTree((i, str(i)) for i in range(100)), yield_every=7)
+        t[100] = '100'
+        del t[0]
+        assert t[5] == '5' and t.get(0) is None and 3 in t and len(t) == 100
+        assert [k async for k in t] == list(range(1, 101))
+        assert [k async for k in t.iter_keys(reverse=True)] == list(range(100, 0, -1))
+        assert await t.keys() == t.tree.get_keys()
+        assert await t.values() == t.tree.get_values()
+        assert await t.items() == list(t.tree.items())
+        assert await t.to_string() == str(t.tree)
+        assert await t.get_dot_string() == t.tree.get_dot_string()
+        await t.clear()
+        assert not t
+        with pytest.raises(ValueError):
+            AsyncRBTree(yield_every=0)
+
+    asyncio.run(main())
+
+
+def test_yields_to_loop():
+    async def main():
+        t = AsyncRBTree(RBTree((i, i) for i in range(1000)), yield_every=10)
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        ticker = asyncio.create_task(tick())
+        await asyncio.sleep(0)
+        await t.keys()
+        ticker.cancel()
+        assert ticks >= 100
+
+    asyncio.run(main())
+
+
+def test_from_items():
+    async def main():
+        t = await AsyncRBTree.from_items({'b': 2, 'a': 1}, key=str.lower)
+        assert await t.items() == [('a', 1), ('b', 2)]
+        assert t.tree.key is str.lower
+
+    asyncio.run(main())
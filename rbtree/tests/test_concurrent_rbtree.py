@@ -0,0 +1,94 @@
+import random
+import threading
+import time
+
+import pytest
+
+from .. import ConcurrentRBTree
+
+
+def test_api():
+    t = ConcurrentRBTree((i, str(i)) for i in range(10))
+    t[10] = '10'
+    del t[0]
+    assert t[5] == '5' and t.get(0) is None and 3 in t
+    assert len(t) == 10
+    assert list(t) == list(range(1, 11))
+    assert list(reversed(t)) == list(range(10, 0, -1))
+    assert (t.min(), t.max(), t.floor(0), t.higher(3)) == (1, 10, None, 4)
+    t.update({20: '20', 1: 'one'})
+    assert t.get_values()[0] == 'one' and t[20] == '20'
+    with t.batch() as tree:
+        tree.remove_range(1, 5)
+    assert t.get_keys() == (6, 7, 8, 9, 10, 20)
+    with pytest.raises(KeyError):
+        del t[1]
+    t.clear()
+    assert not t
+
+
+def test_iteration_snapshot():
+    t = ConcurrentRBTree((i, i) for i in range(1000))
+    t.chunk_size = 10
+    keys = iter(t)
+    seen = [next(keys) for _ in range(15)]
+    t.clear()
+    t[-1] = -1
+    assert seen + list(keys) == list(range(1000))
+    assert list(t.items()) == [(-1, -1)]
+
+
+def test_threads():
+    t = ConcurrentRBTree((i, i) for i in range(0, 1000, 2))
+    errors = []
+
+    def write(seed):
+        rng = random.Random(seed)
+        for _ in range(2000):
+            k = rng.randrange(1000)
+            if rng.random() < 0.5:
+                t[k] = k
+            else:
+                try:
+                    del t[k]
+                except KeyError:
+                    pass
+
+    def read():
+        for _ in range(20):
+            items = list(t.items())
+            if [k for k, _ in items] != sorted(k for k, _ in items) or any(k != v for k, v in items):
+                errors.append(items)
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(4)]
+    threads += [threading.Thread(target=read) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    keys = list(t)
+    assert keys == sorted(set(keys)) and len(t) == len(keys)
+
+
+def test_snapshots_registered_one_at_a_time():
+    t = ConcurrentRBTree((i, i) for i in range(10))
+    snapshot = t._tree.snapshot
+    active, most = [0], [0]
+
+    def slow_snapshot():
+        active[0] += 1
+        most[0] = max(most[0], active[0])
+        time.sleep(0.001)
+        try:
+            return snapshot()
+        finally:
+            active[0] -= 1
+
+    t._tree.snapshot = slow_snapshot
+    threads = [threading.Thread(target=lambda: [list(t) for _ in range(10)]) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert most[0] == 1
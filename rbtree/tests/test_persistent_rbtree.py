@@ -0,0 +1,121 @@
+import random
+
+import pytest
+
+from .. import PersistentRBTree, RBTree
+
+
+def check_node(node) -> int:
+    '''Check the red-black properties of a subtree and get its black height.'''
+    if node is None:
+        return 0
+    if node.red:
+        assert not (node.left and node.left.red) and not (node.right and node.right.red)
+    if node.left:
+        assert node.left.sort_key < node.sort_key
+    if node.right:
+        assert node.sort_key < node.right.sort_key
+    height = check_node(node.left)
+    assert check_node(node.right) == height
+    return height + (not node.red)
+
+
+def check_tree(tree: PersistentRBTree, data: dict) -> None:
+    assert list(tree.items()) == sorted(data.items())
+    assert len(tree) == len(data)
+    assert not (tree._root and tree._root.red)
+    check_node(tree._root)
+
+
+def test_init():
+    t = PersistentRBTree({'a': 1}, b=2)
+    check_tree(t, {'a': 1, 'b': 2})
+    t = PersistentRBTree(str.lower, [('a', 1), ('B', 2)])
+    assert list(t) == ['a', 'B']
+    assert t['b'] == 2
+    with pytest.raises(TypeError, match='got 2'):
+        PersistentRBTree({}, {})
+    t = PersistentRBTree(PersistentRBTree({(1, 2): 3}))
+    check_tree(t, {(1, 2): 3})
+    check_tree(PersistentRBTree(RBTree(a=1)), {'a': 1})
+
+
+def test_versions():
+    rng = random.Random(0)
+    t = PersistentRBTree()
+    data = {}
+    versions = [(t, {})]
+    for i in range(2000):
+        k = rng.randrange(300)
+        if k in data and rng.random() < 0.5:
+            t = t.remove(k)
+            del data[k]
+        else:
+            t = t.insert(k, i)
+            data[k] = i
+        versions.append((t, dict(data)))
+    for t, data in versions[::50]:
+        check_tree(t, data)
+    with pytest.raises(KeyError):
+        t.remove(-1)
+
+
+def test_read_api():
+    t = PersistentRBTree((i, str(i)) for i in range(10))
+    assert (t.min(), t.max()) == (0, 9)
+    assert list(reversed(t)) == list(range(9, -1, -1))
+    assert 3 in t and 10 not in t
+    assert t.get(10, 'x') == 'x'
+    assert (3, '3') in t.items()
+    assert str(t.remove(0).remove(1).remove(2).remove(3).remove(4).remove(5).remove(6).remove(7)) == (
+        "PersistentRBTree({8: '8', 9: '9'})"
+    )
+    with pytest.raises(ValueError):
+        PersistentRBTree().min()
+
+
+def test_snapshot():
+    t = RBTree((i, i) for i in range(100))
+    s = t.snapshot()
+    assert s._root is t._root
+    t[1000] = 0
+    del t[0]
+    t[1] = 'x'
+    check_tree(s, dict((i, i) for i in range(100)))
+
+    s, old = t.snapshot(), dict(t.items())
+    s2 = s.insert(-1, None)
+    assert -1 not in t and -1 not in s
+    t.clear()
+    check_tree(s, old)
+    old[-1] = None
+    check_tree(s2, old)
+
+
+def test_snapshot_iteration():
+    t = RBTree((i, i) for i in range(100))
+    s = t.snapshot()
+    keys = iter(s)
+    seen = [next(keys) for _ in range(10)]
+    t.remove_range(0, 50)
+    assert seen + list(keys) == list(range(100))
+
+    # Deleting a node with two children moves its successor's key into it.
+    t = RBTree((k, k) for k in range(0, 60, 2))
+    s = t.snapshot()
+    keys = iter(s)
+    seen = [next(keys) for _ in range(8)]
+    assert seen[-1] == 14
+    t[1] = 1
+    del t[14]
+    assert seen + list(keys) == list(range(0, 60, 2))
+
+
+def test_copy():
+    t = RBTree(str.lower, (('a', 1), ('B', 2)))
+    t.enable_index()
+    c = t.copy()
+    c['c'] = 3
+    assert list(t.items()) == [('a', 1), ('B', 2)]
+    assert list(c.items()) == [('a', 1), ('B', 2), ('c', 3)]
+    assert c.key is str.lower and c.indexed
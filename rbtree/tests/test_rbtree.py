@@ -1,9 +1,11 @@
-from math import log
+import io
+from math import log2
 from string import ascii_lowercase
 
 import pytest
 
-from .. import RBTree
+from .. import RBTree, RBTreeCursor, RBTreeStats
+from .._rbtree_node import NIL
 
 
 _default_data = dict((char, num) for num, char in enumerate(ascii_lowercase, start=1))
@@ -13,7 +15,9 @@ def check_tree(tree: RBTree, data: dict) -> None:
     assert sorted(tree.keys()) == sorted(tuple(data.keys()))
     assert sorted(tree.values()) == sorted(tuple(data.values()))
     assert len(tree) == len(data)
-    assert tree.height < 2 * log(len(tree) + 1)
+    tree.validate()
+    lo, hi = tree.height_bounds
+    assert lo <= tree.height <= hi <= 2 * log2(len(tree) + 1)
 
 
 @pytest.mark.parametrize(
@@ -29,6 +33,18 @@ def test_init(data):
     check_tree(t, data)
 
 
+def test_init_from_tree():
+    t = RBTree({(1, 2): 3, (4, 5): 6})
+    check_tree(RBTree(t), {(1, 2): 3, (4, 5): 6})
+    check_tree(RBTree(RBTree(a=1)), {'a': 1})
+    check_tree(RBTree.from_items(RBTree(a=1, b=2)), {'a': 1, 'b': 2})
+    check_tree(RBTree(t.items()), {(1, 2): 3, (4, 5): 6})
+    with pytest.raises(TypeError, match='at most 1 positional argument, got 2'):
+        RBTree({'a': 1}, {'b': 2})
+    with pytest.raises(TypeError, match='at most 2 positional arguments, got 3'):
+        RBTree(None, {'a': 1}, {'b': 2})
+
+
 @pytest.mark.parametrize(
     'data, new_key, existing_key, new_value',
     (
@@ -110,3 +126,596 @@ def test_clear():
     t.clear()
     assert not t
     assert len(t) == 0
+    t['a'] = 1
+    check_tree(t, {'a': 1})
+
+
+def test_nil_sentinel():
+    t = RBTree(**_default_data)
+    leaves = [
+        child
+        for node in t._traverse_preorder(t._root)
+        for child in (node.left, node.right)
+        if not child
+    ]
+    assert all(leaf is NIL for leaf in leaves)
+    with pytest.raises(AttributeError):
+        NIL.parent = t._root
+    with pytest.raises(AttributeError):
+        t._root.foo = 1
+
+
+@pytest.mark.parametrize(
+    'data',
+    (
+        _default_data.copy(),
+        dict((str(i), i) for i in range(100)),
+        dict((str(i), i) for i in range(1000)),
+    ),
+)
+def test_from_items(data):
+    t = RBTree.from_items(data)
+    check_tree(t, data)
+    s = RBTree.from_sorted(list(t.items()))
+    assert s.keys() == t.keys()
+    check_tree(s, data)
+    s['new'] = 1
+    del s['new']
+    check_tree(s, data)
+
+
+def test_from_items_duplicates():
+    t = RBTree.from_items([('a', 1), ('b', 2), ('a', 3)])
+    check_tree(t, {'a': 3, 'b': 2})
+
+
+def test_from_sorted_error():
+    items = list(RBTree(**_default_data).items())
+    with pytest.raises(ValueError):
+        RBTree.from_sorted(reversed(items))
+
+
+class CollidingKey:
+    def __init__(self, value):
+        self.value = value
+
+    def __hash__(self):
+        return 0
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+    def __lt__(self, other):
+        return self.value < other.value
+
+    def __repr__(self):
+        return f'CollidingKey({self.value!r})'
+
+
+@pytest.mark.parametrize(
+    'data',
+    (
+        _default_data.copy(),
+        dict((str(i), i) for i in range(1000)),
+    ),
+)
+def test_ordered_keys(data):
+    t = RBTree(data)
+    assert list(t.keys()) == sorted(data)
+    assert list(t.values()) == [data[k] for k in sorted(data)]
+    check_tree(t, data)
+
+
+def test_hash_collisions():
+    keys = [CollidingKey(i) for i in range(100)]
+    t = RBTree((k, k.value) for k in reversed(keys))
+    assert len(t) == 100
+    assert list(t.keys()) == keys
+    for k in keys:
+        assert t[CollidingKey(k.value)] == k.value
+    del t[CollidingKey(50)]
+    assert t.get(CollidingKey(50)) is None
+    assert len(t) == 99
+
+
+def test_key_function():
+    t = RBTree(str.lower, [('b', 1), ('A', 2)], c=3)
+    assert t.key is str.lower
+    assert list(t.keys()) == ['A', 'b', 'c']
+    t['a'] = 4
+    assert len(t) == 3
+    assert t['A'] == 4
+
+    t = RBTree(lambda k: -k, ((i, i) for i in range(10)))
+    assert list(t.keys()) == list(range(9, -1, -1))
+
+
+def test_hash_order():
+    t = RBTree(hash, [(CollidingKey(1), 1), (CollidingKey(2), 2)])
+    assert len(t) == 1
+    assert t[CollidingKey(3)] == 2
+
+    t = RBTree.from_items(((str(i), i) for i in range(100)), key=hash)
+    assert list(t.keys()) == sorted(t.keys(), key=hash)
+
+
+def test_navigation():
+    t = RBTree((i, str(i)) for i in range(0, 100, 10))
+    assert t.min() == 0
+    assert t.max() == 90
+    assert t.floor(25) == 20
+    assert t.floor(20) == 20
+    assert t.floor(-1) is None
+    assert t.ceiling(25) == 30
+    assert t.ceiling(30) == 30
+    assert t.ceiling(91) is None
+    assert t.lower(20) == 10
+    assert t.lower(0) is None
+    assert t.higher(20) == 30
+    assert t.higher(90) is None
+    with pytest.raises(ValueError):
+        RBTree().min()
+    with pytest.raises(ValueError):
+        RBTree().max()
+
+
+@pytest.mark.parametrize(
+    'lo, hi, inclusive, expected',
+    (
+        (None, None, (True, True), list(range(0, 100, 10))),
+        (20, 50, (True, True), [20, 30, 40, 50]),
+        (20, 50, (False, False), [30, 40]),
+        (15, 55, (True, False), [20, 30, 40, 50]),
+        (None, 25, (True, True), [0, 10, 20]),
+        (75, None, (True, True), [80, 90]),
+        (50, 20, (True, True), []),
+    ),
+)
+def test_irange(lo, hi, inclusive, expected):
+    t = RBTree((i, str(i)) for i in range(0, 100, 10))
+    assert list(t.irange(lo, hi, inclusive)) == expected
+    assert list(t.irange(lo, hi, inclusive, reverse=True)) == expected[::-1]
+
+
+def check_sizes(tree: RBTree) -> None:
+    for node in tree._traverse_postorder(tree._root):
+        assert node.size == node.left.size + node.right.size + 1
+
+
+def test_order_statistics():
+    keys = list(range(0, 200, 2))
+    t = RBTree((k, k) for k in keys[::-1])
+    assert t.rank(0) == 0
+    assert t.rank(51) == 26
+    assert t.rank(1000) == len(keys)
+    assert [t.select(i) for i in range(len(keys))] == keys
+    assert t.select(-1) == keys[-1]
+    with pytest.raises(IndexError):
+        t.select(len(keys))
+
+    for k in keys[::3]:
+        del t[k]
+        keys.remove(k)
+    for k in range(1, 50, 2):
+        t[k] = k
+        keys.append(k)
+    keys.sort()
+    check_sizes(t)
+    assert [t.select(i) for i in range(len(keys))] == keys
+    assert t[5:20] == keys[5:20]
+    assert t[::7] == keys[::7]
+    assert t[-3:] == keys[-3:]
+
+
+def test_percentile():
+    t = RBTree((i, i) for i in range(1, 101))
+    assert t.percentile(0) == 1
+    assert t.percentile(50) == 50
+    assert t.percentile(99.5) == 100
+    assert t.percentile(100) == 100
+    with pytest.raises(ValueError):
+        t.percentile(101)
+    with pytest.raises(ValueError):
+        RBTree().percentile(50)
+
+
+def test_views():
+    t = RBTree(_default_data)
+    keys, values, items = t.keys(), t.values(), t.items()
+    assert list(keys) == sorted(_default_data)
+    assert list(reversed(keys)) == sorted(_default_data, reverse=True)
+    assert list(values) == [_default_data[k] for k in sorted(_default_data)]
+    assert list(reversed(items)) == sorted(_default_data.items(), reverse=True)
+    assert 'a' in keys and 'A' not in keys
+    assert 26 in values and 27 not in values
+    assert ('b', 2) in items and ('b', 3) not in items
+    assert keys & {'a', 'A'} == {'a'}
+
+    t['A'] = 0
+    assert len(keys) == len(items) == len(values) == 27
+    assert next(iter(items)) == ('A', 0)
+    assert list(t) == list(keys)
+    assert t.get_keys() == tuple(keys)
+
+
+def test_views_concurrent_modification():
+    t = RBTree(_default_data)
+    with pytest.raises(RuntimeError):
+        for k in t.keys():
+            del t[k]
+    with pytest.raises(RuntimeError):
+        for k, v in t.items():
+            t[k + k] = v
+
+    for k, v in t.items():
+        t[k] = v + 1
+
+
+@pytest.mark.parametrize('n', (10, 1000))
+def test_remove_range(n):
+    data = dict((i, str(i)) for i in range(n))
+    t = RBTree(data)
+    assert t.remove_range(n // 4, n // 2, (True, False)) == n // 2 - n // 4
+    for k in range(n // 4, n // 2):
+        del data[k]
+    check_tree(t, data)
+    assert t.pop_range(hi=1) == [(0, '0'), (1, '1')]
+    for k in range(2):
+        del data[k]
+    check_tree(t, data)
+    assert t.remove_range(n, 2 * n) == 0
+
+
+@pytest.mark.parametrize('n', (10, 1000))
+def test_delete_many(n):
+    data = dict((i, str(i)) for i in range(n))
+    t = RBTree(data)
+    keys = list(range(0, 2 * n, 3))
+    assert t.delete_many(keys) == len(range(0, n, 3))
+    for k in range(0, n, 3):
+        del data[k]
+    check_tree(t, data)
+    t.enable_order_statistics()
+    t.delete_many(range(n // 2))
+    check_sizes(t)
+    assert t.select(0) == min(k for k in data if k >= n // 2)
+
+
+@pytest.mark.parametrize('n', (0, 1, 10, 1000))
+@pytest.mark.parametrize('at', (-1, 0, 0.5, 0.9, 1))
+def test_split_join(n, at):
+    data = dict((i, str(i)) for i in range(n))
+    key = int(n * at)
+    t = RBTree(data)
+    left, right = t.split(key)
+    assert not t
+    assert list(left) == list(range(min(max(key, 0), n)))
+    assert list(right) == list(range(max(key, 0), n))
+    check_sizes(left)
+    check_sizes(right)
+
+    t = RBTree.join(left, right)
+    assert not left and not right
+    assert list(t) == list(range(n))
+    if n:
+        check_tree(t, data)
+        check_sizes(t)
+
+
+def test_join_error():
+    with pytest.raises(ValueError):
+        RBTree.join(RBTree(a=1, c=3), RBTree(b=2))
+    with pytest.raises(ValueError):
+        RBTree.join(RBTree(a=1), RBTree(str.lower, b=2))
+
+
+@pytest.mark.parametrize(
+    'a, b',
+    (
+        ({}, {}),
+        (dict.fromkeys(range(0, 100, 2), 'a'), {}),
+        (dict.fromkeys(range(0, 100, 2), 'a'), dict.fromkeys(range(0, 100, 3), 'b')),
+        (dict.fromkeys(range(50), 'a'), dict.fromkeys(range(25, 1000), 'b')),
+    ),
+)
+def test_set_operations(a, b):
+    ta, tb = RBTree(a), RBTree(b)
+    for result, expected in (
+        (ta | tb, {**a, **b}),
+        (ta & tb, dict((k, b[k]) for k in a if k in b)),
+        (ta - tb, dict((k, a[k]) for k in a if k not in b)),
+        (ta ^ tb, dict((k, v) for d, e in ((a, b), (b, a)) for k, v in d.items() if k not in e)),
+        (ta.union(b, merge=lambda x, y: x + y), {**a, **b, **dict((k, a[k] + b[k]) for k in a if k in b)}),
+    ):
+        assert dict(result.items()) == expected
+        assert list(result) == sorted(expected)
+        if expected:
+            check_tree(result, expected)
+    assert dict(ta.items()) == a
+    assert dict(tb.items()) == b
+
+
+def check_index(tree: RBTree) -> None:
+    assert tree._index == dict((node.sort_key, node) for node in tree._iter_nodes())
+
+
+@pytest.mark.parametrize(
+    'data',
+    (
+        _default_data.copy(),
+        dict((str(i), i) for i in range(1000)),
+    ),
+)
+def test_index(data):
+    t = RBTree(data)
+    t.enable_index()
+    assert t.indexed
+    check_index(t)
+    for k in list(data)[::3]:
+        del t[k]
+        del data[k]
+    t['new'] = 0
+    data['new'] = 0
+    check_index(t)
+    check_tree(t, data)
+    assert 'new' in t and t.find('new') == 0
+    with pytest.raises(KeyError):
+        t.find('missing')
+
+    t.delete_many(list(data)[: len(data) // 2])
+    check_index(t)
+    t.clear()
+    check_index(t)
+    t.disable_index()
+    assert not t.indexed
+
+
+@pytest.mark.parametrize('batch', (0, 10, 100, 5000))
+def test_insert_many(batch):
+    data = dict((i, i) for i in range(0, 2000, 2))
+    t = RBTree(data)
+    keys = [(i * 7919) % 3000 for i in range(batch)]
+    t.insert_many(keys, [-k for k in keys])
+    data.update((k, -k) for k in keys)
+    check_tree(t, data)
+    assert list(t) == sorted(data)
+    with pytest.raises(ValueError):
+        t.insert_many([1, 2], [1])
+
+
+def test_find_many():
+    t = RBTree((i, str(i)) for i in range(0, 100, 2))
+    keys = [5, 4, 98, 0, 99, -1, 4]
+    assert t.find_many(keys) == [None, '4', '98', '0', None, None, '4']
+    assert t.find_many(keys, default='') == ['', '4', '98', '0', '', '', '4']
+    t.enable_index()
+    assert t.find_many(keys) == [None, '4', '98', '0', None, None, '4']
+
+
+def test_remove_many():
+    data = dict((i, i) for i in range(100))
+    t = RBTree(data)
+    t.remove_many(range(0, 100, 3))
+    for k in range(0, 100, 3):
+        del data[k]
+    check_tree(t, data)
+    with pytest.raises(KeyError):
+        t.remove_many([1, 3])
+    assert 1 in t
+
+
+def test_many_numpy():
+    numpy = pytest.importorskip('numpy')
+    t = RBTree()
+    t.insert_many(numpy.arange(10), numpy.arange(10) * 2)
+    assert t.find_many(numpy.array([3, 11]), default=-1).tolist() == [6, -1]
+    t.remove_many(numpy.arange(5))
+    assert list(t) == list(range(5, 10))
+
+
+def test_cursor():
+    t = RBTree((i, i) for i in range(0, 20, 2))
+    c = t.cursor(5)
+    assert isinstance(c, RBTreeCursor)
+    assert (c.key, c.value) == (6, 6)
+    assert c.next().key == 8
+    assert c.prev().prev().key == 4
+    assert c.seek(13).key == 14
+    assert c.seek(-1).key == 0
+    assert not c.prev()
+    with pytest.raises(ValueError):
+        c.key
+    assert not t.cursor(19)
+    assert repr(t.cursor(19)) == '<RBTreeCursor end>'
+
+    c = t.cursor(6)
+    c.insert_after(7, 'a').insert_after(9, 'b').insert_before(8, 'c')
+    assert c.key == 8
+    c.value = 'd'
+    assert t[8] == 'd'
+    with pytest.raises(ValueError):
+        c.insert_after(7, None)
+    with pytest.raises(ValueError):
+        c.insert_before(9, None)
+    assert list(t.items()) == [(0, 0), (2, 2), (4, 4), (6, 6), (7, 'a'), (8, 'd'), (9, 'b')] + [
+        (i, i) for i in range(10, 20, 2)
+    ]
+
+
+def test_cursor_after_changes():
+    t = RBTree((i, i) for i in range(10))
+    c = t.cursor(4)
+    del t[4]
+    assert c.key == 5
+    t[4] = 4
+    assert c.key == 5
+    t.clear()
+    assert not c
+
+
+def test_insert_hint():
+    data = {}
+    t = RBTree()
+    t.enable_order_statistics()
+    node = None
+    for i in range(1000):
+        k = i * 10 + (i * 7919) % 13
+        node = t.insert(k, i, hint=node)
+        data[k] = i
+        assert node.key == k
+    check_tree(t, data)
+    check_sizes(t)
+    assert list(t) == sorted(data)
+
+    removed = t.insert(-1, None)
+    del t[-1]
+    assert t.insert(5, 5, hint=removed).key == 5
+    assert t.insert(6, 6, hint=t.cursor(100)).key == 6
+    with pytest.raises(ValueError):
+        t.insert(7, 7, hint=RBTree().cursor())
+
+
+def test_insert_stale_hint():
+    t = RBTree((i, i) for i in range(100))
+    node = t._get_node(50)
+    t.clear()
+    t.insert(1, 1, hint=node)
+    check_tree(t, {1: 1})
+
+    t = RBTree((i, i) for i in range(0, 1000, 10))
+    node = t._get_node(100)
+    t.remove_range(50, 150)
+    t.insert(200, 'x', hint=node)
+    t.insert(105, 105, hint=node)
+    data = dict((i, i) for i in range(0, 1000, 10) if not 50 <= i <= 150)
+    data.update({200: 'x', 105: 105})
+    assert dict(t.items()) == data
+    t.validate()
+
+    t = RBTree((i, i) for i in range(100))
+    node = t._get_node(80)
+    left, right = t.split(50)
+    left.insert(80, 'left', hint=node)
+    assert right[80] == 80 and left[80] == 'left'
+    left.validate()
+    right.validate()
+    joined = RBTree.join(left, RBTree((i, i) for i in range(200, 300)))
+    node = joined._get_node(250)
+    left.insert(250, 'left', hint=node)
+    assert joined[250] == 250
+
+
+def test_diagnostics():
+    t = RBTree((i, i) for i in range(100))
+    out = io.StringIO()
+    t.write_dot(out)
+    assert out.getvalue() == t.get_dot_string() == ''.join(t.iter_dot_lines())
+    assert t.get_dot_string().count(' -- ') == 200
+    assert ''.join(t.iter_dot_lines(max_depth=1)).count(' -- ') == 6
+
+    out = io.StringIO()
+    t.write_tree(out)
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 100 and lines[0].startswith('--> ')
+
+    out = io.StringIO()
+    t.write_tree(out, max_depth=1)
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 7 and sum(line.endswith('...') for line in lines) == 4
+
+    out = io.StringIO()
+    t.write_tree(out, max_nodes=10)
+    lines = out.getvalue().splitlines()
+    assert len(lines) == 11 and lines[-1].endswith('...')
+
+    assert str(RBTree()) == 'RBTree({})'
+    assert str(RBTree({1: 'a', 2: 'b'})) == "RBTree({1: 'a', 2: 'b'})"
+
+
+def test_stats():
+    keys = list(range(200))
+    shuffle = keys[1::2] + keys[::2]
+    t = RBTree()
+    assert t.stats is None
+    stats = t.enable_stats()
+    assert isinstance(stats, RBTreeStats) and t.stats is stats
+
+    for k in shuffle:
+        t[k] = k
+    assert stats.operations['insert'] == 200
+    assert stats.rotations['insert'] == t.rotations
+    assert stats.cases['insert_case_2'] + stats.cases['insert_case_3'] == t.rotations
+    assert sum(stats.depths.values()) == 200
+
+    seen = []
+    stats.add_listener(seen.append)
+    assert t.find(t._root.key) == t._root.key
+    assert seen[-1].operation == 'find' and seen[-1].depth == 1 and seen[-1].comparisons == 2
+    assert t.get(-1) is None
+    assert stats.failures['find'] == 1 and stats.operations['find'] == 1 and len(seen) == 1
+    stats.remove_listener(seen.append)
+
+    rotations = t.rotations
+    for k in keys[:150]:
+        t.remove(k)
+    with pytest.raises(KeyError):
+        t.remove(0)
+    assert stats.operations['remove'] == 150 and stats.failures['remove'] == 1
+    assert stats.rotations['remove'] == t.rotations - rotations
+    assert sum(stats.cases[f'delete_case_{i}'] for i in (1, 3, 4)) == stats.rotations['remove']
+    check_tree(t, dict((k, k) for k in keys[150:]))
+
+    stats.reset()
+    t.enable_stats(sample_every=10)
+    for k in range(100):
+        t.get(150 + k % 50)
+    assert stats.operations['find'] == 10 and len(seen) == 1
+
+    stats.reset()
+    t.enable_stats(sample_every=2)
+    for k in range(150, 160):
+        del t[k]
+    assert stats.operations == {'remove': 5}
+    assert sorted(stats.as_dict()) == [
+        'cases', 'comparisons', 'depths', 'failures', 'operations', 'recolors', 'rotations', 'seconds',
+    ]
+
+    t.disable_stats()
+    t[1000] = 1
+    assert t.stats is None and t._trace is None
+    with pytest.raises(ValueError):
+        t.enable_stats(sample_every=0)
+
+
+def test_validate():
+    t = RBTree.from_items((i, i) for i in range(1000))
+    t.validate()
+    left, right = t.split(500)
+    left.validate()
+    RBTree.join(left, right).validate()
+    t.remove_range(100, 600)
+    t.validate()
+    assert t.black_height <= t.height <= 2 * t.black_height
+    assert RBTree().height_bounds == (0, 0) and RBTree().height == 0
+
+    t = RBTree((i, i) for i in range(100))
+    t.enable_index()
+    t.enable_order_statistics()
+    t.validate()
+
+    def corrupted(corrupt):
+        tree = RBTree((i, i) for i in range(100))
+        tree.enable_index()
+        tree.enable_order_statistics()
+        corrupt(tree)
+        with pytest.raises(RuntimeError):
+            tree.validate()
+
+    corrupted(lambda tree: setattr(tree._root, 'red', True))
+    corrupted(lambda tree: setattr(tree._get_node(0), 'red', not tree._get_node(0).red))
+    corrupted(lambda tree: setattr(tree._root.left, 'parent', tree._root.right))
+    corrupted(lambda tree: setattr(tree._get_min_node(), 'sort_key', 1000))
+    corrupted(lambda tree: setattr(tree, '_len', 99))
+    corrupted(lambda tree: setattr(tree, '_black_height', 1))
+    corrupted(lambda tree: setattr(tree._root, 'size', 1))
+    corrupted(lambda tree: tree._index.pop(5))
@@ -0,0 +1,87 @@
+import pytest
+
+from .. import RBTreeCache
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def check_cache(cache: RBTreeCache) -> None:
+    '''Check that the orderings of the cache agree with its entries.'''
+    for tree in (cache._entries, cache._recency, cache._expiry):
+        tree.validate()
+    entries = dict(cache._entries.items())
+    assert sorted(cache._recency.values()) == sorted(entries)
+    assert all(cache._recency[entry.tick] == k for k, entry in entries.items())
+    assert dict((k, e.expiry) for k, e in entries.items() if e.expiry is not None) == dict(
+        (k, expiry) for expiry, k in cache._expiry.items()
+    )
+
+
+def test_lru():
+    cache = RBTreeCache(max_size=3)
+    for k in 'abc':
+        cache[k] = k.upper()
+    assert cache['a'] == 'A'
+    cache['d'] = 'D'
+    assert list(cache) == ['a', 'c', 'd']
+    assert 'b' not in cache and cache.get('b') is None
+    cache['c'] = 'C2'
+    cache['e'] = 'E'
+    assert list(cache.items()) == [('c', 'C2'), ('d', 'D'), ('e', 'E')]
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 1, 2)
+    check_cache(cache)
+
+    cache.clear()
+    for i in range(1000):
+        cache[i % 7] = i
+        cache.get(i % 5)
+    assert len(cache) == 3
+    check_cache(cache)
+
+
+def test_ttl():
+    clock = Clock()
+    cache = RBTreeCache(ttl=10, timer=clock)
+    cache['a'] = 1
+    clock.now = 5
+    cache['b'] = 2
+    cache.set('c', 3, ttl=None)
+    cache.set('d', 4, ttl=1)
+    check_cache(cache)
+
+    clock.now = 10
+    assert 'a' not in cache and 'd' not in cache and list(cache) == ['b', 'c']
+    assert len(cache) == 4
+    with pytest.raises(KeyError):
+        cache['a']
+    assert cache.expirations == 1 and cache.misses == 1
+    assert cache.expire() == 1 and len(cache) == 2
+    assert cache.pop('b') == 2 and cache.pop('b', None) is None
+    with pytest.raises(KeyError):
+        cache.pop('b')
+
+    clock.now = 10 ** 6
+    assert cache['c'] == 3
+    check_cache(cache)
+
+    for i in range(100):
+        clock.now = i
+        cache[f'{i:03}'] = i
+    cache.set('x', -1, ttl=0.5)
+    assert len(cache) == 12
+    clock.now = 100
+    assert cache.expire() == 2 and list(cache) == [f'{i:03}' for i in range(91, 100)] + ['c']
+    cache['y'] = 1000
+    check_cache(cache)
+    cache.clear()
+    assert not cache and cache.expirations == 94
+    with pytest.raises(ValueError):
+        RBTreeCache(ttl=0)
+    with pytest.raises(ValueError):
+        RBTreeCache(max_size=0)
@@ -0,0 +1,74 @@
+import pickle
+
+import pytest
+
+from .. import MappedRBTree, RBTree
+
+
+@pytest.mark.parametrize(
+    'items, missing',
+    (
+        ([], 0),
+        ([(i, -i) for i in range(1000)], -1),
+        ([(i / 4, float(i)) for i in range(-100, 100)], 0.1),
+        ([(str(i), (i, None)) for i in range(100)], ''),
+        ([(2 ** 70, 1), (2 ** 71, 'x')], 0),
+    ),
+)
+def test_dump_load(tmp_path, items, missing):
+    path = tmp_path / 'tree.rbt'
+    t = RBTree(items)
+    t.dump(path)
+    loaded = RBTree.load(path)
+    assert list(loaded.items()) == list(t.items())
+    assert loaded.height <= t.height
+
+    with MappedRBTree(path) as m:
+        assert len(m) == len(t)
+        assert list(m.items()) == list(t.items())
+        assert list(reversed(m)) == list(reversed(t))
+        for k, v in items[::7]:
+            assert m[k] == v and k in m
+        assert m.get(missing, 'missing') == 'missing'
+
+
+def test_mapped_queries(tmp_path):
+    path = tmp_path / 'tree.rbt'
+    RBTree((i, str(i)) for i in range(0, 100, 2)).dump(path)
+    m = MappedRBTree(path)
+    assert (m.min(), m.max()) == (0, 98)
+    assert m.find(10) == '10'
+    assert 11 not in m
+    with pytest.raises(KeyError):
+        m[11]
+    assert list(m.irange(11, 20)) == [12, 14, 16, 18, 20]
+    assert list(m.irange(10, 20, (False, False), reverse=True)) == [18, 16, 14, 12]
+    assert list(m.irange_items(hi=4)) == [(0, '0'), (2, '2'), (4, '4')]
+    m.close()
+
+
+def test_key_function(tmp_path):
+    path = tmp_path / 'tree.rbt'
+    RBTree(str.lower, [('a', 1), ('B', 2), ('c', 3)]).dump(path)
+    assert list(RBTree.load(path, key=str.lower)) == ['a', 'B', 'c']
+    with pytest.raises(ValueError):
+        RBTree.load(path)
+    with MappedRBTree(path, key=str.lower) as m:
+        assert m['b'] == 2 and list(m.irange('b', 'C')) == ['B', 'c']
+
+
+def test_bad_file(tmp_path):
+    path = tmp_path / 'tree.rbt'
+    path.write_bytes(b'not a tree' * 10)
+    with pytest.raises(ValueError):
+        RBTree.load(path)
+    with pytest.raises(ValueError):
+        MappedRBTree(path)
+
+
+def test_pickle():
+    t = RBTree(str.lower, ((str(i), i) for i in range(1000)))
+    t.enable_index()
+    loaded = pickle.loads(pickle.dumps(t))
+    assert list(loaded.items()) == list(t.items())
+    assert loaded.key is str.lower and loaded.indexed
@@ -1 +1,2 @@
-from .parallel_sort import parallel_sort
\ No newline at end of file
+from .parallel_sort import parallel_sort
+from .complexity import COMPLEXITY_MODELS, LATEX_COMPLEXITY, fit_complexity
\ No newline at end of file
@@ -0,0 +1,46 @@
+import math
+
+
+COMPLEXITY_MODELS = {
+    '1': lambda n: 1.0,
+    'log n': lambda n: math.log2(n),
+    'n': lambda n: float(n),
+    'n log n': lambda n: n * math.log2(n),
+}
+
+LATEX_COMPLEXITY = {
+    '1': '$ O(1) $',
+    'log n': '$ O(\\log{n}) $',
+    'n': '$ O(n) $',
+    'n log n': '$ O(n \\log{n}) $',
+}
+
+
+def fit_complexity(sizes, times):
+    '''
+    Find the model ``t = c * f(n)`` that fits the measured times best.
+
+    Each model is fitted by least squares on the logarithms, so every size
+    weighs the same however long it takes, and the model with the smallest
+    residual wins.
+
+    Example::
+
+        >>> fit_complexity([1000, 10000, 100000], [0.001, 0.01, 0.1])[0]
+        'n'
+
+    :return: The name of the model (a key of ``COMPLEXITY_MODELS``), its
+        coefficient and the mean squared residual.
+    '''
+    points = [(n, t) for n, t in zip(sizes, times) if n >= 2 and t > 0]
+    if len(points) < 2:
+        raise ValueError(f'At least two sizes are needed to fit a curve, got {len(points)}')
+
+    best = None
+    for name, f in COMPLEXITY_MODELS.items():
+        logs = [math.log(t) - math.log(f(n)) for n, t in points]
+        log_c = sum(logs) / len(logs)
+        residual = sum((x - log_c) ** 2 for x in logs) / len(logs)
+        if best is None or residual < best[2]:
+            best = (name, math.exp(log_c), residual)
+    return best
@@ -1,6 +1,24 @@
+import argparse
+import json
+import os
+
 import helpers
 import latex
 
+try:
+    import matplotlib
+    matplotlib.use('Agg')
+    from matplotlib import pyplot as plt
+except ImportError:
+    plt = None
+
+
+REPORT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPO_DIR = os.path.dirname(REPORT_DIR)
+
+# The benchmark suite counts one op per key for these, but each is one call.
+WHOLE_TREE_OPERATIONS = ('get_keys', 'get_values', 'iterate')
+
 
 def get_methods_list(file_path, full=False):
     p, brace = (0, '(') if not full else (1, ')')
@@ -24,14 +42,156 @@ def get_methods_description(methods: list):
     return '\n'.join(f'{k} {v}' for k, v in desc.items())
 
 
-def get_complexity_table(methods):
+def get_complexity_table(methods, latencies=None):
+    '''
+    Get the table of the complexities of the methods.
+
+    :param latencies: The result of :func:`get_latencies`. The complexity of
+        each measured method is fitted to the measurements; the others are
+        marked as not measured.
+    '''
+    latencies = latencies or {}
     table = latex.LatexTable(2, caption='Оценка временной сложности методов класса RBTree', label='complexity')
     table.set_header('Метод', 'Оценка временной сложности')
     for method in methods:
-        table.add_row(f'\\verb|{method}|', '$ O(n) $')
+        if method in latencies:
+            name, _, _ = helpers.fit_complexity(*latencies[method])
+            complexity = helpers.LATEX_COMPLEXITY[name]
+        else:
+            complexity = '---'
+        table.add_row(f'\\verb|{method}|', complexity)
+    return table.render()
+
+
+def load_benchmark(file_path):
+    '''Load the JSON written by ``python -m benchmarks.suite --output``.'''
+    with open(file_path, 'r') as f:
+        return json.load(f)
+
+
+def get_engines(benchmark):
+    engines = []
+    for case in benchmark['cases']:
+        if case['engine'] not in engines:
+            engines.append(case['engine'])
+    return engines
+
+
+def get_latencies(benchmark, engine='node', distribution='random'):
+    '''
+    Get the time of one call of each operation against the tree size.
+
+    :return: ``{operation: (sizes, seconds)}`` with the sizes ascending.
+    '''
+    series = {}
+    for row in benchmark['results']:
+        if row['engine'] != engine or row['distribution'] != distribution:
+            continue
+        calls = 1 if row['operation'] in WHOLE_TREE_OPERATIONS else row['ops']
+        sizes, times = series.setdefault(row['operation'], ([], []))
+        sizes.append(row['size'])
+        times.append(row['seconds'] / calls)
+    return {operation: helpers.parallel_sort(sizes, times) for operation, (sizes, times) in series.items()}
+
+
+def get_throughputs(benchmark, operations, distribution='random'):
+    '''
+    Get the throughput of the operations of every engine against the tree size.
+
+    :return: ``{'engine operation': (sizes, ops_per_sec)}`` with the sizes ascending.
+    '''
+    series = {}
+    for row in benchmark['results']:
+        if row['operation'] not in operations or row['distribution'] != distribution or row['ops_per_sec'] is None:
+            continue
+        sizes, rates = series.setdefault(f'{row["engine"]} {row["operation"]}', ([], []))
+        sizes.append(row['size'])
+        rates.append(row['ops_per_sec'])
+    return {name: helpers.parallel_sort(sizes, rates) for name, (sizes, rates) in series.items()}
+
+
+def format_latency(seconds):
+    '''Format seconds as microseconds with about three significant digits.'''
+    us = seconds * 1e6
+    return f'{us:.0f}' if us >= 100 else f'{us:.3g}'
+
+
+def get_measured_complexity_table(latencies, engine):
+    '''Get the table of the measured times and the complexities fitted to them.'''
+    sizes = sorted({n for series_sizes, _ in latencies.values() for n in series_sizes})
+    table = latex.LatexTable(
+        2 + len(sizes),
+        caption=f'Время выполнения методов (мкс) и оценка сложности по замерам, реализация {engine}',
+        label=f'measured-complexity-{engine}',
+    )
+    table.set_header('Метод', 'Оценка', *(f'$ n = {n} $' for n in sizes))
+    for operation, (series_sizes, times) in latencies.items():
+        name, _, _ = helpers.fit_complexity(series_sizes, times)
+        by_size = dict(zip(series_sizes, times))
+        table.add_row(
+            f'\\verb|{operation}|',
+            helpers.LATEX_COMPLEXITY[name],
+            *(format_latency(by_size[n]) if n in by_size else '---' for n in sizes),
+        )
     return table.render()
 
 
+def plot_series(series, file_path, ylabel, scale=1.0):
+    '''
+    Plot the series against the tree size on log-log axes.
+
+    :return: False if matplotlib is not installed and nothing was plotted.
+    '''
+    if plt is None:
+        return False
+    fig, ax = plt.subplots(figsize=(7, 4.5))
+    for name, (sizes, values) in series.items():
+        ax.plot(sizes, [v * scale for v in values], marker='o', label=name)
+    ax.set_xscale('log')
+    ax.set_yscale('log')
+    ax.set_xlabel('$n$')
+    ax.set_ylabel(ylabel)
+    ax.grid(True, which='both', alpha=0.3)
+    ax.legend()
+    fig.savefig(file_path, dpi=150, bbox_inches='tight')
+    plt.close(fig)
+    return True
+
+
+def get_complexity_chapter(benchmark, photo_dir, distribution='random'):
+    '''
+    Get the complexity chapter of the report from the benchmark results.
+
+    The plots are saved to ``photo_dir``; without matplotlib the chapter has
+    the tables only.
+    '''
+    engines = get_engines(benchmark)
+    chapter = (
+        '\\section{Оценка временной сложности}\n'
+        '\n'
+        'Оценки получены по замерам времени выполнения методов на деревьях разного размера '
+        f'(ключи: {distribution}, Python {benchmark["meta"]["python"]}). '
+        'Для каждого метода выбрана зависимость вида $ c \\cdot f(n) $, '
+        'где $ f(n) $ --- одна из $ 1 $, $ \\log{n} $, $ n $, $ n \\log{n} $, '
+        'наилучшим образом приближающая замеры.\n'
+    )
+    for engine in engines:
+        latencies = get_latencies(benchmark, engine, distribution)
+        if not latencies:
+            continue
+        chapter += get_measured_complexity_table(latencies, engine)
+        if plot_series(latencies, os.path.join(photo_dir, f'latency_{engine}.png'), 'мкс на вызов', 1e6):
+            chapter += latex.PictureCreator.get_picture(
+                f'latency_{engine}', f'Время выполнения методов, реализация {engine}', f'latency-{engine}',
+            )
+    throughputs = get_throughputs(benchmark, ('insert', 'find', 'remove'), distribution)
+    if plot_series(throughputs, os.path.join(photo_dir, 'throughput.png'), 'операций в секунду'):
+        chapter += latex.PictureCreator.get_picture(
+            'throughput', 'Пропускная способность вставки, поиска и удаления', 'throughput',
+        )
+    return chapter
+
+
 def get_tests_descriptions(tests):
     desc = ''
     for test in tests:
@@ -66,8 +226,25 @@ def get_examples_page(ru_names, en_names):
     return page
 
 def main():
-    methods = get_methods_list('/home/kirill/programming/1lab-algo-3-2/rbtree/_rbtree.py')
-    tests = get_methods_list('/home/kirill/programming/1lab-algo-3-2/rbtree/tests/test_rbtree.py', True)
+    parser = argparse.ArgumentParser(description='Generate the parts of the report.')
+    parser.add_argument('--benchmark', help='the JSON of benchmarks.suite to write the complexity chapter from')
+    parser.add_argument('--distribution', default='random', help='the key distribution of the benchmark to use')
+    parser.add_argument(
+        '--output',
+        default=os.path.join(REPORT_DIR, 'modules', 'chapters', 'complexity.tex'),
+        help='the file to write the complexity chapter to',
+    )
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark = load_benchmark(args.benchmark)
+        chapter = get_complexity_chapter(benchmark, os.path.join(REPORT_DIR, 'photo'), args.distribution)
+        with open(args.output, 'w') as f:
+            f.write(chapter)
+        return
+
+    methods = get_methods_list(os.path.join(REPO_DIR, 'rbtree', '_rbtree.py'))
+    tests = get_methods_list(os.path.join(REPO_DIR, 'rbtree', 'tests', 'test_rbtree.py'), True)
     get_methods_description(methods)
     get_complexity_table(['insert', 'remove', 'find', 'clear', 'get_keys', 'get_values', 'print'])
     get_tests_descriptions(tests)